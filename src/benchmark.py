@@ -0,0 +1,155 @@
+import argparse
+import csv
+import json
+import logging
+import platform
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, List, Dict, Any
+
+import heuristics as hr
+import instance_generator as gen
+import instrumentation as instr
+import main as mn
+import routing as rt
+import solver_models as sm
+
+logger = logging.getLogger(__name__)
+
+# size tiers: generator parameters of each tier
+TIERS = {
+    "tiny": {"nb_locations": 30, "nb_orders": 12, "max_nb_orders": 4},
+    "small": {"nb_locations": 200, "nb_orders": 300},
+    "medium": {"nb_locations": 1000, "nb_orders": 2000},
+    "large": {"nb_locations": 3000, "nb_orders": 10000},
+}
+
+# columns of the CSV history, in order
+FIELDS = ("timestamp", "tier", "seed", "nb_locations", "nb_orders", "stage", "wall", "cpu", "peak_mb", "objective")
+
+def measure(stage: str, function: Callable[[], Any], record: List[Dict[str, Any]], objective: Callable[[Any], float] | None = None):
+    """
+    Run function, append its wall / CPU time, peak Python memory (tracemalloc, NumPy included)
+    and objective to record, and return its result.
+    """
+    tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = function()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    entry = {"stage": stage, "wall": wall, "cpu": cpu, "peak_mb": peak / 2 ** 20,
+             "objective": objective(result) if objective is not None else None}
+    record.append(entry)
+    logger.info("%s: %.3fs wall, %.3fs cpu, %.1f MB peak, objective %s", stage, wall, cpu, entry["peak_mb"], entry["objective"])
+    return result
+
+def run_tier(tier: str, params: Dict[str, Any], seed: int = 0, mip_max_orders: int = 30, time_limit: float = 10.0) -> List[Dict[str, Any]]:
+    """
+    Generate the instance of a tier and time every stage of the pipeline on it:
+    load_data, ifloc, common_elements, greedy_batching, route_length_batching, heuristic_picking,
+    and, on instances of at most mip_max_orders orders, model_batching and model_picking
+    (warm-started, time_limit seconds each).
+
+    Returns:
+        List[Dict]: one entry per stage
+    """
+    record: List[Dict[str, Any]] = []
+
+    with tempfile.TemporaryDirectory(prefix=f"bench-{tier}-") as directory:
+        instance = gen.generate_instance(seed=seed, **params)
+        # infeasible instances would be benchmarked with invalid solutions
+        gen.check_instance(instance)
+        paths = gen.write_instance(directory, instance)
+        del instance
+
+        data = measure("load_data", lambda: mn.load_data(str(paths["matrix"]), str(paths["orders"]), str(paths["constraints"])), record)
+
+    ifloc = measure("ifloc", lambda: data.ifloc, record)
+    a = measure("common_elements", lambda: data.common_locations, record, objective=len)
+    estimator = rt.RouteLengthEstimator(data["adj_matrix"], ifloc)
+
+    batches = measure("greedy_batching", lambda: hr.greedy_batching(data), record,
+                      objective=lambda batches: hr.batching_objective(batches, a))
+    measure("route_length_batching", lambda: hr.route_length_batching(data, estimator=estimator), record,
+            objective=estimator.total)
+
+    if data.nb_orders <= mip_max_orders:
+        batches = measure("model_batching", lambda: sm.model_batching(
+            data, compact=True, initial_batches=batches, solver=sm.make_solver(time_limit=time_limit, msg=False, warm_start=True)),
+            record, objective=lambda batches: hr.batching_objective(batches, a))
+
+    data["batches"] = batches
+    measure("locations_pickers", lambda: data["locations_pickers"], record)
+
+    def travel_length(result) -> float:
+        return float(sum(data["adj_matrix"][i, j] for arcs in result[0].values() for i, j in arcs))
+
+    travel = measure("heuristic_picking", lambda: rt.heuristic_picking(data), record, objective=travel_length)
+
+    if data.nb_orders <= mip_max_orders:
+        measure("model_picking", lambda: sm.model_picking(
+            data, decompose=True, workers=1, initial_travel=travel[0], solver=sm.make_solver(time_limit=time_limit, msg=False, warm_start=True)),
+            record, objective=travel_length)
+
+    timestamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    for entry in record:
+        entry.update({"timestamp": timestamp, "tier": tier, "seed": seed,
+                      "nb_locations": data.nb_locations, "nb_orders": data.nb_orders})
+    return record
+
+def append_history(record: List[Dict[str, Any]], history: str | Path):
+    """
+    Append benchmark entries to a history file: JSON lines (.jsonl / .json) or CSV (.csv).
+    """
+    history = Path(history)
+    history.parent.mkdir(parents=True, exist_ok=True)
+    if history.suffix == ".csv":
+        new = not history.exists()
+        with history.open("a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+            if new:
+                writer.writeheader()
+            writer.writerows(record)
+    else:
+        with history.open("a", encoding="utf-8") as f:
+            for entry in record:
+                f.write(json.dumps({**entry, "python": platform.python_version()}) + "\n")
+
+def run_benchmark(tiers: List[str], seed: int = 0, history: List[str | Path] = (), **kwargs) -> List[Dict[str, Any]]:
+    """
+    Run run_tier on every tier and append the entries to each history file.
+    """
+    record = []
+    for tier in tiers:
+        if tier not in TIERS:
+            raise ValueError(f"Unknown tier: {tier} (available: {', '.join(TIERS)})")
+        logger.info("Benchmark tier %s (%s)", tier, TIERS[tier])
+        record += run_tier(tier, TIERS[tier], seed=seed, **kwargs)
+    for path in history:
+        append_history(record, path)
+    peak = instr.peak_rss_mb()
+    if peak is not None:
+        logger.info("Peak RSS: %.1f MB", peak)
+    return record
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the pipeline stages on synthetic instances")
+    parser.add_argument("--tiers", nargs="+", default=["tiny", "small"], choices=list(TIERS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--history", nargs="*", default=["benchmarks/history.jsonl", "benchmarks/history.csv"])
+    parser.add_argument("--mip-max-orders", type=int, default=30)
+    parser.add_argument("--time-limit", type=float, default=10.0)
+    args = parser.parse_args()
+
+    record = run_benchmark(args.tiers, seed=args.seed, history=args.history,
+                           mip_max_orders=args.mip_max_orders, time_limit=args.time_limit)
+    for entry in record:
+        print(f"{entry['tier']:>8} {entry['stage']:>22} {entry['wall']:9.3f}s {entry['peak_mb']:9.1f} MB  {entry['objective']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import logging
+import os
+import subprocess
+import tempfile
+from typing import List, Dict, Any
+
+import numpy as np
+import pulp as pl
+
+import instrumentation as instr
+
+logger = logging.getLogger(__name__)
+
+_DIGITS = np.array(list("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+
+def _names(prefix: str, count: int) -> np.ndarray:
+    """Names of at most 8 characters (fixed MPS format): prefix + index in base 36, zero-padded to one width."""
+    if count > 36 ** 7:
+        raise ValueError(f"Too many rows or columns for the MPS format: {count}")
+    index = np.arange(count)
+    names = np.full(count, prefix)
+    for power in reversed(range(len(np.base_repr(max(count - 1, 0), 36)))):
+        names = np.char.add(names, _DIGITS[index // 36 ** power % 36])
+    return names
+
+def _format(values: np.ndarray) -> np.ndarray:
+    """Values formatted as % .12e, once per distinct value (the coefficients of a model take few values)."""
+    unique, inverse = np.unique(values, return_inverse=True)
+    return np.char.mod("% .12e", unique)[inverse] if len(unique) else np.zeros(0, dtype="<U1")
+
+def _fields(*columns) -> np.ndarray:
+    """Lines made of the given string arrays (or strings), in order."""
+    lines = columns[0]
+    for column in columns[1:]:
+        lines = np.char.add(lines, column)
+    return lines
+
+class BulkModel:
+    """
+    Linear model assembled in bulk from NumPy arrays and written directly as MPS for CBC,
+    instead of one PuLP expression per constraint.
+
+    Variables are numbered in the order they are added (add_variables returns their indices);
+    constraints are given as coordinate arrays (row, column, coefficient) with one sense and
+    right-hand side per row. Columns are named C<k> and rows R<k> (k in base 36) in the MPS file,
+    which is written from the coordinate arrays without a Python loop over the coefficients.
+
+    A maximization is written as the minimization of the opposite objective, which also keeps
+    the MIP start of CBC valid (CBC drops MIP starts of -max problems).
+    """
+
+    def __init__(self, name: str, maximize: bool = False):
+        self.name = name
+        self.maximize = maximize
+        self._lb: List[np.ndarray] = []
+        self._ub: List[np.ndarray] = []
+        self._integer: List[np.ndarray] = []
+        self._obj: List[np.ndarray] = []
+        self._rows: List[np.ndarray] = []
+        self._cols: List[np.ndarray] = []
+        self._vals: List[np.ndarray] = []
+        self._senses: List[np.ndarray] = []
+        self._rhs: List[np.ndarray] = []
+        self.nb_variables = 0
+        self.nb_constraints = 0
+
+    def add_variables(self, count: int, lb: float = 0, ub: float = 1, integer: bool = True, obj=0.0) -> np.ndarray:
+        """Add count variables (binary by default) and return their indices. obj is a scalar or an array."""
+        self._lb.append(np.full(count, lb, dtype=np.float64))
+        self._ub.append(np.full(count, ub, dtype=np.float64))
+        self._integer.append(np.full(count, integer, dtype=bool))
+        self._obj.append(np.broadcast_to(np.asarray(obj, dtype=np.float64), (count,)).copy())
+        index = np.arange(self.nb_variables, self.nb_variables + count)
+        self.nb_variables += count
+        return index
+
+    def add_constraints(self, rows: np.ndarray, cols: np.ndarray, vals, sense: str, rhs) -> np.ndarray:
+        """
+        Add the constraints sum(vals[k] * x[cols[k]] for rows[k] == r) <sense> rhs[r], with rows
+        numbered from 0 for this call and sense "E", "L" or "G". Returns the indices of the rows.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        rhs = np.asarray(rhs, dtype=np.float64)
+        count = len(rhs) if rhs.ndim else (int(rows.max()) + 1 if len(rows) else 0)
+        rhs = np.broadcast_to(rhs, (count,))
+
+        self._rows.append(rows + self.nb_constraints)
+        self._cols.append(np.asarray(cols, dtype=np.int64))
+        self._vals.append(np.broadcast_to(np.asarray(vals, dtype=np.float64), (len(rows),)).copy())
+        self._senses.append(np.full(count, sense))
+        self._rhs.append(rhs.copy())
+        index = np.arange(self.nb_constraints, self.nb_constraints + count)
+        self.nb_constraints += count
+        return index
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        def cat(arrays, dtype):
+            return np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+        return {
+            "lb": cat(self._lb, np.float64), "ub": cat(self._ub, np.float64), "integer": cat(self._integer, bool),
+            "obj": cat(self._obj, np.float64), "rows": cat(self._rows, np.int64), "cols": cat(self._cols, np.int64),
+            "vals": cat(self._vals, np.float64), "senses": cat(self._senses, "<U1"), "rhs": cat(self._rhs, np.float64),
+        }
+
+    def size(self) -> Dict[str, int]:
+        """Number of variables, constraints and non-zero coefficients, as instrumentation.model_size."""
+        return {"variables": self.nb_variables, "constraints": self.nb_constraints,
+                "nonzeros": int(sum(len(rows) for rows in self._rows))}
+
+    def write_mps(self, path: str):
+        """Write the model as a fixed-format MPS file (minimization, see the class docstring)."""
+        m = self._arrays()
+        obj = -m["obj"] if self.maximize else m["obj"]
+        col_names = _names("C", self.nb_variables)
+        row_names = _names("R", self.nb_constraints)
+        col_fields = np.char.ljust(col_names, 8)
+        row_fields = np.char.ljust(row_names, 8)
+
+        # coefficients sorted by column, after the objective line of the column, which also
+        # declares the columns without coefficients
+        obj_cols = np.flatnonzero((obj != 0) | (np.bincount(m["cols"], minlength=self.nb_variables) == 0))
+        cols = np.concatenate((obj_cols, m["cols"]))
+        rows = np.concatenate((np.full(len(obj_cols), -1), m["rows"]))
+        by_col = np.lexsort((rows, cols))
+        cols, rows = cols[by_col], rows[by_col]
+        labels = np.where(rows >= 0, row_fields[np.maximum(rows, 0)] if self.nb_constraints else "", "OBJ     ")
+        entries = _fields("    ", col_fields[cols], "  ", labels, "  ", _format(np.concatenate((obj[obj_cols], m["vals"]))[by_col]))
+
+        # integer columns are between markers, one pair per run of consecutive integer columns
+        integer = m["integer"]
+        changes = np.flatnonzero(np.diff(integer.astype(np.int8))) + 1
+        bounds = np.concatenate(([0], changes, [self.nb_variables]))
+        blocks = [[f"NAME          {self.name}", "ROWS", " N  OBJ"], _fields(" ", m["senses"], "  ", row_names), ["COLUMNS"]]
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            if first == last:
+                continue
+            if integer[first]:
+                blocks.append(["    MARKER                 'MARKER'                 'INTORG'"])
+            blocks.append(entries[np.searchsorted(cols, first):np.searchsorted(cols, last)])
+            if integer[first]:
+                blocks.append(["    MARKER                 'MARKER'                 'INTEND'"])
+
+        blocks.append(["RHS"])
+        rhs_rows = np.flatnonzero(m["rhs"])
+        blocks.append(_fields("    RHS       ", row_fields[rhs_rows], "  ", _format(m["rhs"][rhs_rows])))
+
+        # bounds sorted by column: FX, or LO / MI then UP / PL
+        lb, ub = m["lb"], m["ub"]
+        fixed = lb == ub
+        kinds = [(" FX BND       ", fixed, lb), (" LO BND       ", ~fixed & (lb != 0) & np.isfinite(lb), lb),
+                 (" MI BND       ", ~fixed & np.isneginf(lb), None), (" UP BND       ", ~fixed & np.isfinite(ub), ub),
+                 (" PL BND       ", ~fixed & ~np.isfinite(ub) & integer, None)]
+        bound_cols, bound_lines = [], []
+        for head, mask, values in kinds:
+            which = np.flatnonzero(mask)
+            bound_cols.append(which)
+            if values is None:
+                bound_lines.append(_fields(head, col_names[which]))
+            else:
+                bound_lines.append(_fields(head, col_fields[which], "  ", _format(values[which])))
+        by_col = np.argsort(np.concatenate(bound_cols), kind="stable")
+        blocks.append(["BOUNDS"])
+        blocks.append(np.concatenate(bound_lines)[by_col] if len(by_col) else [])
+        blocks.append(["ENDATA"])
+
+        with open(path, "w", encoding="ascii") as f:
+            for block in blocks:
+                if len(block):
+                    f.write("\n".join(block.tolist() if isinstance(block, np.ndarray) else block))
+                    f.write("\n")
+
+    def write_mip_start(self, path: str, values: np.ndarray):
+        """Write a MIP start in the solution format read by CBC (-mips)."""
+        lines = ["Stopped on time - objective value 0"]
+        lines += [f"{c:>7} {name} {v:>15.12g} {0:>23}" for c, (name, v) in enumerate(zip(_names("C", len(values)).tolist(), np.asarray(values, dtype=np.float64).tolist()))]
+        with open(path, "w", encoding="ascii") as f:
+            f.write("\n".join(lines))
+            f.write("\n")
+
+    def solve(self, time_limit: float | None = None, gap: float | None = None, threads: int | None = None,
+              msg: bool = False, initial: np.ndarray | None = None, name: str | None = "solve", **info) -> Dict[str, Any]:
+        """
+        Write the model and solve it with the CBC binary shipped with PuLP.
+
+        Args:
+            time_limit, gap, threads, msg: as in solver_models.make_solver
+            initial (np.ndarray | None): values of every variable, passed as MIP start
+            name (str | None): instrumentation stage of the solve (None: not recorded)
+            info: extra fields of the stage (e.g. the build time)
+
+        Returns:
+            Dict: status (PuLP status name), objective and values (np.ndarray, one per variable)
+        """
+        if name is None:
+            return self._solve(time_limit, gap, threads, msg, initial)
+        with instr.stage(name, model=self.name, **info, **self.size()) as entry:
+            result = self._solve(time_limit, gap, threads, msg, initial)
+            entry.update(result["log"])
+            entry["status"] = result["status"]
+            entry["objective"] = result["objective"]
+        return result
+
+    def _solve(self, time_limit, gap, threads, msg, initial) -> Dict[str, Any]:
+        with tempfile.TemporaryDirectory(prefix="bulk-") as directory:
+            mps = os.path.join(directory, "model.mps")
+            solution = os.path.join(directory, "model.sol")
+            self.write_mps(mps)
+
+            args = [pl.PULP_CBC_CMD().path, mps]
+            if initial is not None:
+                mst = os.path.join(directory, "model.mst")
+                self.write_mip_start(mst, initial)
+                args += ["-mips", mst]
+            if time_limit is not None:
+                args += ["-sec", str(time_limit)]
+            if gap is not None:
+                args += ["-ratio", str(gap)]
+            if threads is not None:
+                args += ["-threads", str(threads)]
+            args += ["-timeMode", "elapsed", "-solve", "-solution", solution]
+
+            process = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, text=True)
+            if msg:
+                print(process.stdout, end="")
+            if process.returncode != 0 or not os.path.exists(solution):
+                raise pl.PulpSolverError(f"CBC failed on {self.name}:\n{process.stdout[-2000:]}")
+
+            values = np.zeros(self.nb_variables)
+            with open(solution, encoding="ascii") as f:
+                header = f.readline().split()
+                for line in f:
+                    fields = line.split()
+                    if fields and fields[0] == "**":
+                        fields = fields[1:]
+                    # only the columns are printed, by index
+                    if len(fields) >= 3:
+                        values[int(fields[0])] = float(fields[2])
+
+        status = {"Optimal": "Optimal", "Infeasible": "Infeasible", "Integer": "Infeasible", "Unbounded": "Unbounded"}.get(header[0] if header else "", "Not Solved")
+        if status == "Not Solved" and len(header) >= 5 and header[4] == "objective":
+            # stopped with an integer solution
+            status = "Optimal"
+
+        obj = self._arrays()["obj"]
+        return {"status": status, "objective": float(obj @ values), "values": values, "log": instr.parse_cbc_log(process.stdout)}
@@ -1,18 +1,40 @@
 from typing import List, Dict, Tuple
 
-def check_distance_matrix(matrix: List[List[float]]) -> Tuple[bool, List[str]]:
+import numpy as np
+
+# maximum number of sample coordinates / orders quoted in an error message
+MAX_SAMPLES = 5
+
+# number of cells of the distance matrix checked at once (bounds the temporary arrays)
+BLOCK_CELLS = 1 << 24
+
+def _aggregate(label: str, count: int, samples: List[str]) -> str:
+    """One error message for count offending items, quoting a few samples."""
+    return f"{count} {label}, e.g. {', '.join(samples[:MAX_SAMPLES])}"
+
+def check_distance_matrix(matrix: np.ndarray, check_symmetry: bool = False, check_triangle: bool = False, sample_size: int = 10000, seed: int = 0) -> Tuple[bool, List[str]]:
     """
     Check that a distance matrix is valid.
-    Assumes matrix is a list of lists (loaded by load_matrix).
-    
+    Assumes matrix is a NumPy array (loaded by load_matrix), lists of lists are converted.
+
+    Values are checked with vectorized NumPy operations on blocks of rows, so that the
+    temporary arrays stay small even on a memory-mapped matrix. Errors are aggregated:
+    one message per kind of error with its count and a few sample coordinates.
+
     Checks:
       - Square matrix
       - All rows same length
+      - Finite distances (no NaN / inf)
       - Non-negative distances
       - Diagonal is zero
+      - Optionally, on sample_size random pairs / triplets: symmetry and triangle inequality
 
     Args:
-        matrix (list[list[float]]): The loaded adjacency matrix
+        matrix (np.ndarray): The loaded adjacency matrix
+        check_symmetry (bool): sample d(i, j) == d(j, i)
+        check_triangle (bool): sample d(i, j) <= d(i, k) + d(k, j)
+        sample_size (int): number of sampled pairs / triplets
+        seed (int): seed of the sampling
 
     Returns:
         tuple[bool, list[str]]: (True, ["valid"]) or (False, [errors])
@@ -20,67 +42,136 @@ def check_distance_matrix(matrix: List[List[float]]) -> Tuple[bool, List[str]]:
     errors = []
 
     # Check matrix is not empty
-    if not matrix:
+    if len(matrix) == 0:
         return False, ["File is empty"]
 
     n = len(matrix)
 
     # Check all rows have same length as n
-    for i, row in enumerate(matrix):
-        if len(row) != n:
-            errors.append(f"Row {i} has {len(row)} elements, expected {n}")
-    
-    if errors:
-        return False, errors
-
-    # Check values
-    for i in range(n):
-        for j in range(n):
-            val = matrix[i][j]
-            if val < 0:
-                errors.append(f"Negative distance at ({i},{j})")
-            if i == j and val != 0:
-                errors.append(f"Diagonal at ({i},{j}) is not zero")
+    if isinstance(matrix, np.ndarray):
+        if matrix.ndim != 2 or matrix.shape[1] != n:
+            return False, [f"Matrix has shape {matrix.shape}, expected ({n}, {n})"]
+    else:
+        for i, row in enumerate(matrix):
+            if len(row) != n:
+                errors.append(f"Row {i} has {len(row)} elements, expected {n}")
+        if errors:
+            return False, errors
+        matrix = np.asarray(matrix, dtype=float)
+
+    # Check values, by blocks of rows
+    counts = {"non-finite": 0, "negative": 0}
+    samples = {"non-finite": [], "negative": []}
+    block = max(1, BLOCK_CELLS // n)
+    for start in range(0, n, block):
+        rows = np.asarray(matrix[start:start + block])
+        for kind, bad in (("non-finite", ~np.isfinite(rows)), ("negative", rows < 0)):
+            nb_bad = int(np.count_nonzero(bad))
+            if nb_bad:
+                counts[kind] += nb_bad
+                if len(samples[kind]) < MAX_SAMPLES:
+                    i, j = np.nonzero(bad)
+                    samples[kind] += [f"({start + a},{b})" for a, b in zip(i[:MAX_SAMPLES].tolist(), j[:MAX_SAMPLES].tolist())]
+    if counts["non-finite"]:
+        errors.append(_aggregate("NaN or infinite distances", counts["non-finite"], samples["non-finite"]))
+    if counts["negative"]:
+        errors.append(_aggregate("negative distances", counts["negative"], samples["negative"]))
+
+    diagonal = np.asarray(matrix.diagonal())
+    bad_diagonal = np.flatnonzero(diagonal != 0)
+    if len(bad_diagonal):
+        errors.append(_aggregate("non-zero diagonal values", len(bad_diagonal), [f"({i},{i})" for i in bad_diagonal[:MAX_SAMPLES].tolist()]))
+
+    rng = np.random.default_rng(seed)
+    if check_symmetry:
+        i, j = rng.integers(0, n, size=(2, sample_size))
+        bad = np.flatnonzero(~np.isclose(matrix[i, j], matrix[j, i]))
+        if len(bad):
+            errors.append(_aggregate(f"asymmetric pairs out of {sample_size} sampled", len(bad), [f"({i[k]},{j[k]})" for k in bad[:MAX_SAMPLES]]))
+    if check_triangle:
+        i, j, k = rng.integers(0, n, size=(3, sample_size))
+        direct = matrix[i, j]
+        bad = np.flatnonzero(direct > matrix[i, k] + matrix[k, j] + 1e-9 * np.abs(direct))
+        if len(bad):
+            errors.append(_aggregate(f"triangle inequality violations out of {sample_size} sampled", len(bad), [f"({i[t]},{k[t]},{j[t]})" for t in bad[:MAX_SAMPLES]]))
 
     if errors:
         return False, errors
     return True, ["Distance matrix is valid"]
 
-def check_orders(orders: List[Dict[str, object]]) -> Tuple[bool, List[str]]:
+def check_orders(orders: List[Dict[str, object]], nb_locations: int | None = None) -> Tuple[bool, List[str]]:
     """
-    Check that orders are valid
+    Check that orders are valid (list of dictionaries or instance.OrderSet)
+
+    The location checks run in bulk on the flat array of all locations. Errors are
+    aggregated per kind with a few sample order ids.
 
     Checks:
     - Orders list is not empty
     - Each order has required keys
     - nb_locations matches length of locations_list
     - No duplicate locations
+    - If nb_locations is given, every location id is in [0, nb_locations) (cross-check with the matrix)
+
+    Args:
+        orders: orders loaded by load_orders or load_orders_compact
+        nb_locations (int | None): number of locations of the distance matrix
+
+    Returns:
+        tuple[bool, list[str]]: (True, ["Orders are valid"]) or (False, [errors])
     """
     errors: List[str] = []
 
     if not orders:
         return False, ["No orders loaded"]
 
-    for idx, order in enumerate(orders):
+    if hasattr(orders, "offsets"):
+        # Array-backed orders (instance.OrderSet): keys and nb_locations hold by construction
+        ids = np.asarray(orders.ids)
+        offsets = np.asarray(orders.offsets)
+        locations = np.asarray(orders.locations)
+    else:
         # Required keys
         required_keys = {"id", "volume", "nb_locations", "locations_list", "locations_set"}
-        missing = required_keys - order.keys()
+        missing = [(order.get("id", idx), required_keys - order.keys()) for idx, order in enumerate(orders) if required_keys - order.keys()]
+        for order_id, keys in missing[:MAX_SAMPLES]:
+            errors.append(f"Order {order_id}: missing keys {keys}")
+        if len(missing) > MAX_SAMPLES:
+            errors.append(f"{len(missing) - MAX_SAMPLES} more orders with missing keys")
         if missing:
-            errors.append(f"Order {order.get('id', idx)}: missing keys {missing}")
-            continue
+            return False, errors
+
+        ids = np.fromiter((order["id"] for order in orders), dtype=np.int64, count=len(orders))
+        lengths = np.fromiter((len(order["locations_list"]) for order in orders), dtype=np.int64, count=len(orders))
+        declared = np.fromiter((order["nb_locations"] for order in orders), dtype=np.int64, count=len(orders))
+        offsets = np.zeros(len(orders) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        locations = np.fromiter((loc for order in orders for loc in order["locations_list"]), dtype=np.int64, count=int(offsets[-1]))
 
         # Basic consistency checks
-        if len(order["locations_list"]) != order["nb_locations"]:
-            errors.append(f"Order {order['id']}: nb_locations mismatch")
+        mismatch = np.flatnonzero(lengths != declared)
+        if len(mismatch):
+            errors.append(_aggregate("orders with nb_locations mismatch", len(mismatch), [f"order {i}" for i in ids[mismatch[:MAX_SAMPLES]].tolist()]))
 
-        if len(order["locations_list"]) != len(order["locations_set"]):
-            errors.append(f"Order {order['id']}: duplicate locations detected")
+    rows = np.repeat(np.arange(len(ids)), np.diff(offsets))
+
+    # Duplicated locations: equal neighbours once sorted by (order, location)
+    by_order = np.lexsort((locations, rows))
+    sorted_locs, sorted_rows = locations[by_order], rows[by_order]
+    duplicated = np.unique(sorted_rows[1:][(sorted_rows[1:] == sorted_rows[:-1]) & (sorted_locs[1:] == sorted_locs[:-1])])
+    if len(duplicated):
+        errors.append(_aggregate("orders with duplicate locations", len(duplicated), [f"order {i}" for i in ids[duplicated[:MAX_SAMPLES]].tolist()]))
+
+    # Location ids against the size of the distance matrix
+    if nb_locations is not None:
+        out_of_range = np.unique(rows[(locations < 0) | (locations >= nb_locations)])
+        if len(out_of_range):
+            errors.append(_aggregate(f"orders with locations outside [0, {nb_locations})", len(out_of_range), [f"order {i}" for i in ids[out_of_range[:MAX_SAMPLES]].tolist()]))
+
+    if errors:
+        return False, errors
+    return True, ["Orders are valid"]
 
-        if not errors:
-            return True, ["Orders are valid"]
-        else:
-            return False, errors
-        
 def check_constraints(constraints: List[int]) -> Tuple[bool, List[str]]:
     """
     Check that the file constraints is valid
@@ -0,0 +1,292 @@
+import logging
+import time
+from typing import List, Dict, Tuple
+
+import numpy as np
+import pulp as pl
+
+import heuristics as hr
+import routing as rt
+import solver_models as sm
+
+logger = logging.getLogger(__name__)
+
+def _column_key(orders) -> Tuple[int, ...]:
+    return tuple(sorted(orders))
+
+def build_master(columns: List[Tuple[int, ...]], costs: List[float], nb_orders: int, max_pickers: int, relax: bool):
+    """
+    Set-partitioning master: choose batches (columns) covering every order exactly once,
+    with at most max_pickers batches, minimizing the total route length.
+
+    Returns:
+        tuple[pl.LpProblem, Dict, Dict, pl.LpConstraint]: the model, its variables x[k], the
+            partitioning constraint of each order and the picker-count constraint
+    """
+    model = pl.LpProblem("master_batching", pl.LpMinimize)
+
+    ## Variables
+
+    # x[k] = 1 if the batch columns[k] is done by a picker
+    if relax:
+        x = pl.LpVariable.dicts("x", range(len(columns)), lowBound=0, upBound=1)
+    else:
+        x = pl.LpVariable.dicts("x", range(len(columns)), cat="Binary")
+
+    ## Objective function
+    model += pl.lpSum(costs[k] * x[k] for k in range(len(columns)))
+
+    ## Constraints
+
+    columns_of = {o: [] for o in range(nb_orders)}
+    for k, column in enumerate(columns):
+        for o in column:
+            columns_of[o].append(k)
+
+    # every order is in exactly one chosen batch
+    cover = {}
+    for o in range(nb_orders):
+        cover[o] = pl.lpSum(x[k] for k in columns_of[o]) == 1
+        model += cover[o], f"cover_{o}"
+
+    # no more batches than pickers
+    pickers = pl.lpSum(x.values()) <= max_pickers
+    model += pickers, "pickers"
+
+    return model, x, cover, pickers
+
+def price_columns(data, estimator: rt.RouteLengthEstimator, duals: List[float], picker_dual: float,
+                  known: set, max_columns: int, nb_candidates: int, deadline: float) -> List[Tuple[Tuple[int, ...], float]]:
+    """
+    Pricing heuristic: look for batches with a negative reduced cost
+    cost(batch) - sum(duals[o] for o in batch) - picker_dual.
+
+    From every seed order (by decreasing dual), a batch is grown by adding the candidate
+    with the smallest reduced cost after insertion, while max_nb_orders / max_vol are
+    respected; every new negative batch met on the way is returned. Candidates are the
+    orders sharing locations with the batch (inverted index of ifloc) and the orders
+    with the largest duals.
+
+    Returns:
+        List[tuple[tuple, float]]: new columns (sorted orders) with their route length
+    """
+    ifloc = data["ifloc"]
+    vol = data["vol"]
+    max_nb_orders = data["max_nb_orders"]
+    max_vol = data["max_vol"]
+    universal = ifloc.universal_locations()
+
+    seeds = sorted(range(len(duals)), key=lambda o: -duals[o])
+    top_duals = seeds[:nb_candidates]
+    found = {}
+
+    for seed in seeds:
+        if len(found) >= max_columns or time.perf_counter() >= deadline:
+            break
+        batch = [seed]
+        batch_vol = vol[seed]
+        dual_sum = duals[seed]
+        neighbours = set(ifloc.neighbours(seed, exclude=universal)[0].tolist())
+
+        while len(batch) < max_nb_orders:
+            candidates = [o for o in neighbours | set(top_duals) if o not in batch and batch_vol + vol[o] <= max_vol]
+            candidates = sorted(candidates, key=lambda o: -duals[o])[:2 * nb_candidates]
+            best, best_reduced, best_cost = None, None, None
+            for o in candidates:
+                cost = estimator.batch_cost(batch + [o])
+                reduced = cost - dual_sum - duals[o] - picker_dual
+                if best is None or reduced < best_reduced:
+                    best, best_reduced, best_cost = o, reduced, cost
+            if best is None:
+                break
+
+            batch.append(best)
+            batch_vol += vol[best]
+            dual_sum += duals[best]
+            neighbours.update(ifloc.neighbours(best, exclude=universal)[0].tolist())
+
+            key = _column_key(batch)
+            if best_reduced < -1e-6 and key not in known and key not in found:
+                found[key] = best_cost
+
+    return list(found.items())
+
+def order_route_bounds(data) -> np.ndarray:
+    """
+    Lower bound on the route length of any batch containing each order: the route goes from
+    location 0 to the arrival nb_locations - 1 through every location of the order, hence is at
+    least adj_matrix[0, loc] + adj_matrix[loc, arrival] for each of them (triangle inequality,
+    adj_matrix holding shortest distances). 0 for every order unless 0 and nb_locations - 1 are
+    visited by every order (otherwise the arrival depends on the batch).
+    """
+    ifloc = data["ifloc"]
+    nb_orders = data["nb_orders"]
+    arrival = data["nb_locations"] - 1
+    universal = ifloc.universal_locations()
+    bounds = np.zeros(nb_orders)
+    if not (np.isin(0, universal) and np.isin(arrival, universal)):
+        return bounds
+
+    adj_matrix = data["adj_matrix"]
+    through = np.asarray(adj_matrix[0, :], dtype=np.float64) + np.asarray(adj_matrix[:, arrival], dtype=np.float64)
+    rows = np.repeat(np.arange(nb_orders), np.diff(ifloc.order_ptr))
+    np.maximum.at(bounds, rows, through[ifloc.order_locs])
+    return bounds
+
+def pricing_bounds(duals: List[float], picker_dual: float, order_bounds: np.ndarray, vol: List[int],
+                   max_nb_orders: int, max_vol: int, max_states: int = 1 << 22) -> Tuple[float, float]:
+    """
+    Exact pricing over a relaxed cost: a batch costs at least the largest order_bounds of its
+    orders. Orders are added by increasing bound t to a cardinality-constrained knapsack
+    (at most max_nb_orders orders of volume at most max_vol, dynamic programming over
+    (orders, volume), or over the orders only when it has more than max_states states) whose
+    best value B(t) is the largest sum of duals of a batch of bound at most t. Then, for every
+    batch:
+        - reduced cost: cost - sum(duals) - picker_dual >= min_t(t - B(t)) - picker_dual
+        - dual ratio: (sum(duals) + picker_dual) / cost <= max_t((B(t) + picker_dual) / t)
+
+    Returns:
+        tuple[float, float]: (bound on the smallest reduced cost, bound on the largest ratio;
+            inf if a batch may have a zero bound)
+    """
+    duals = np.asarray(duals, dtype=np.float64)
+    by_bound = np.argsort(order_bounds, kind="stable")
+    exact = (max_nb_orders + 1) * (max_vol + 1) <= max_states
+    # best_kv[k, v]: best sum of duals of at most k orders of total volume at most v
+    best_kv = np.zeros((max_nb_orders + 1, max_vol + 1)) if exact else None
+    top: List[float] = []
+
+    min_reduced, max_ratio = -picker_dual, 0.0
+    for position, o in enumerate(by_bound.tolist()):
+        if duals[o] > 0 and vol[o] <= max_vol:
+            if exact:
+                w = vol[o]
+                np.maximum(best_kv[1:, w:], best_kv[:-1, :max_vol + 1 - w] + duals[o], out=best_kv[1:, w:])
+            else:
+                top = sorted(top + [duals[o]], reverse=True)[:max_nb_orders]
+        t = float(order_bounds[o])
+        if position + 1 < len(by_bound) and order_bounds[by_bound[position + 1]] == t:
+            continue
+        best = float(best_kv.max()) if exact else sum(top)
+        min_reduced = min(min_reduced, t - best - picker_dual)
+        if best + picker_dual > 0:
+            max_ratio = max(max_ratio, (best + picker_dual) / t if t > 0 else float("inf"))
+    return min_reduced, max_ratio
+
+def colgen_batching(data, estimator: rt.RouteLengthEstimator | None = None, time_limit: float = 60.0,
+                    max_iterations: int = 100, max_columns: int = 50, nb_candidates: int = 10,
+                    integer_time_limit: float | None = None, solver=None) -> Tuple[Dict[int, List[int]], Dict[str, float]]:
+    """
+    Set-partitioning / column-generation batching: batches are columns priced by their
+    estimated route length (RouteLengthEstimator), instead of the quadratic y/z model of
+    model_batching.
+
+    1. Initial columns: every order alone, and the batches of greedy_batching and
+       route_length_batching (so the master always has a good integer solution).
+    2. Column generation: the LP relaxation of the master is solved with CBC, and its duals
+       are given to the heuristic pricing (price_columns) which adds batches with a negative
+       reduced cost, until none is found, max_iterations or time_limit.
+    3. The master is solved with binary variables over every generated column.
+
+    The pricing is heuristic, so the restricted master LP is not a bound. A valid lower bound
+    on the LP of the full master is computed at every round from the duals and an exact
+    pricing over a relaxed cost (pricing_bounds): Lagrangian bound restricted LP +
+    max_pickers * min(0, min reduced cost) and Farley bound restricted LP / max dual ratio. The
+    gap reported is relative to the best one. Costs are route-length estimates, so the bound
+    assumes they are at least the shortest route (true for routes built on shortest distances).
+
+    Args:
+        data (Dict): instance data built by main.load_data
+        estimator (RouteLengthEstimator | None): route-length estimator, built on data if None
+        time_limit (float): time budget of the column generation in seconds
+        max_iterations (int): maximum number of pricing rounds
+        max_columns (int): maximum columns added per round
+        nb_candidates (int): candidates of the pricing heuristic
+        integer_time_limit (float | None): time limit of the final integer solve (if solver is None)
+        solver (pl.LpSolver | None): solver of the final integer master (see solver_models.make_solver),
+            warm-started CBC with integer_time_limit if None
+
+    Returns:
+        tuple[Dict, Dict]: {picker: list of assigned orders} (same shape as model_batching), and
+            statistics: columns, iterations, restricted_lp (last restricted master LP),
+            lower_bound (valid bound), objective, gap (relative to lower_bound)
+    """
+    nb_orders = data["nb_orders"]
+    start = time.perf_counter()
+    deadline = start + time_limit
+
+    if estimator is None:
+        estimator = rt.RouteLengthEstimator(data["adj_matrix"], data["ifloc"])
+
+    columns: List[Tuple[int, ...]] = []
+    costs: List[float] = []
+    known = set()
+
+    def add_column(orders, cost=None):
+        key = _column_key(orders)
+        if key and key not in known:
+            known.add(key)
+            columns.append(key)
+            costs.append(estimator.batch_cost(list(key)) if cost is None else cost)
+
+    for o in range(nb_orders):
+        add_column([o])
+    incumbent = hr.route_length_batching(data, estimator=estimator, time_limit=min(1.0, time_limit / 10))
+    for batches in (hr.greedy_batching(data), incumbent):
+        for orders in batches.values():
+            add_column(orders)
+
+    # the incumbent may use more batches than max_pickers (route_length_batching does not bound them)
+    used = sum(1 for orders in incumbent.values() if orders)
+    max_pickers = max(data["max_pickers"], used)
+
+    order_bounds = order_route_bounds(data)
+    restricted_lp = None
+    lower_bound = 0.0
+    iteration = 0
+    while iteration < max_iterations and time.perf_counter() < deadline:
+        iteration += 1
+        model, x, cover, pickers = build_master(columns, costs, nb_orders, max_pickers, relax=True)
+        status = sm.solve_model(model, sm.make_solver(msg=False), name="colgen_master_lp", iteration=iteration)
+        if pl.LpStatus[status] != "Optimal":
+            logger.warning("Master LP status %s at iteration %s", pl.LpStatus[status], iteration)
+            break
+        restricted_lp = pl.value(model.objective)
+
+        duals = [model.constraints[f"cover_{o}"].pi or 0.0 for o in range(nb_orders)]
+        picker_dual = model.constraints["pickers"].pi or 0.0
+        # Lagrangian and Farley bounds on the LP of the full master
+        min_reduced, max_ratio = pricing_bounds(duals, picker_dual, order_bounds, data["vol"], data["max_nb_orders"], data["max_vol"])
+        lower_bound = max(lower_bound, restricted_lp + max_pickers * min(0.0, min_reduced))
+        if max_ratio > 0:
+            lower_bound = max(lower_bound, restricted_lp / max(1.0, max_ratio))
+
+        new_columns = price_columns(data, estimator, duals, picker_dual, known, max_columns, nb_candidates, deadline)
+        logger.info("Column generation iteration %s: restricted LP %.2f, lower bound %.2f, %s columns, %s new",
+                    iteration, restricted_lp, lower_bound, len(columns), len(new_columns))
+        if not new_columns:
+            break
+        for key, cost in new_columns:
+            add_column(key, cost)
+
+    # final integer master, started from the incumbent
+    model, x, _, _ = build_master(columns, costs, nb_orders, max_pickers, relax=False)
+    incumbent_keys = {_column_key(orders) for orders in incumbent.values() if orders}
+    for k, column in enumerate(columns):
+        x[k].setInitialValue(1 if column in incumbent_keys else 0)
+    if solver is None:
+        solver = sm.make_solver(time_limit=integer_time_limit, msg=False, warm_start=True)
+    sm.solve_model(model, solver, name="colgen_master")
+
+    batches = [list(columns[k]) for k in range(len(columns)) if (x[k].varValue or 0) > 0.5]
+    if sorted(o for orders in batches for o in orders) != list(range(nb_orders)):
+        logger.warning("Integer master returned no complete solution, keeping the incumbent")
+        batches = [orders for orders in incumbent.values() if orders]
+
+    objective = sum(estimator.batch_cost(orders) for orders in batches)
+    gap = (objective - lower_bound) / objective if objective else 0.0
+    stats = {"columns": len(columns), "iterations": iteration, "restricted_lp": restricted_lp, "lower_bound": lower_bound,
+             "objective": objective, "gap": gap, "time": time.perf_counter() - start}
+    logger.info("Column generation batching: %s", stats)
+
+    return hr.pad_batches(batches, max(data["max_pickers"], len(batches))), stats
@@ -1,21 +1,26 @@
 import numpy as np
+from array import array
 from pathlib import Path
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Tuple, Iterator, NamedTuple
 
-def load_matrix(path: str | Path) -> np.ndarray:
+def load_matrix(path: str | Path, dtype=np.float64) -> np.ndarray:
     """
     Load a square adjacency matrix from a file.
     Supports text (.txt) with a header line, or NumPy binary (.npy).
 
     Text format expected:
         - First line: number of locations (optional, can be used for verification)
-        - Remaining lines: square matrix (space, tab, or comma separated)
+        - Remaining lines: square matrix (space or tab separated)
+
+    .npy files are memory-mapped (read-only) instead of being read in memory,
+    so the matrix is only paged in where it is accessed.
 
     Args:
         path (str | Path): Path to the matrix file.
+        dtype: dtype of the matrix parsed from text (np.float64 or np.float32).
 
     Returns:
-        np.ndarray: Loaded square matrix.
+        np.ndarray: Loaded square matrix (np.memmap for .npy files), indexed as adj_matrix[i, j].
 
     Raises:
         FileNotFoundError: If the file does not exist.
@@ -31,69 +36,65 @@ def load_matrix(path: str | Path) -> np.ndarray:
         raise FileNotFoundError(f"Fichier introuvable : {path}")
 
     if path.suffix == ".npy":
-        # Binary format: fast and exact
-        adj_mat = np.load(path)
+        # Binary format: fast and exact, mapped instead of copied
+        adj_mat = np.load(path, mmap_mode="r")
 
         if adj_mat.ndim != 2 or adj_mat.shape[0] != adj_mat.shape[1]:
             raise ValueError("Loaded matrix must be 2D and square")
-        
-        adj_mat = adj_mat.tolist()  # convertit l'array en liste de listes Python
+
         return adj_mat
-    
+
     # Text format: handle header line
     with path.open("r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    # Boolean for
-    header = False
+        first_line = f.readline().split()
 
     # Get number of location
-    try:
-        nb_loc = int(lines[0].strip())
-        if nb_loc == len(lines) - 1:
-            header = True
-    except ValueError:
-        pass
+    nb_loc = None
+    if len(first_line) == 1:
+        try:
+            nb_loc = int(first_line[0])
+        except ValueError:
+            pass
+    header = nb_loc is not None
 
-    
-    # Initialize an empty NumPy array
-    adj_mat = np.zeros((nb_loc, nb_loc), dtype=float)
+    # Parse the numbers straight into a NumPy array
+    adj_mat = np.loadtxt(path, dtype=dtype, skiprows=1 if header else 0, ndmin=2)
 
-    if header == True:
-        # Fill in the matrix
-        for i in range(nb_loc):
-            row = [float(x) for x in lines[i + 1].strip().split()]
-            adj_mat[i] = row
+    if adj_mat.shape[0] != adj_mat.shape[1]:
+        raise ValueError(f"Matrix must be square, got shape {adj_mat.shape}")
+    if header and adj_mat.shape[0] != nb_loc:
+        raise ValueError(f"Header announces {nb_loc} locations, matrix has {adj_mat.shape[0]}")
 
-        adj_mat = adj_mat.tolist()  # convertit l'array en liste de listes Python
-        return adj_mat
+    return adj_mat
 
-    else: 
-        for i in range(nb_loc):
-            row = [float(x) for x in lines[i].strip().split()]
-            adj_mat[i] = row
-        
-        adj_mat = adj_mat.tolist()  # convertit l'array en liste de listes Python
-        return adj_mat
+class CompactOrders(NamedTuple):
+    """
+    Array-backed storage of orders: the locations of order k are
+    locations[offsets[k]:offsets[k + 1]].
+    """
+    ids: np.ndarray        # int64, order number as written in the file
+    volumes: np.ndarray    # int64
+    offsets: np.ndarray    # int64, len = nb orders + 1
+    locations: np.ndarray  # int32, flat locations of every order
 
-def load_orders(path: str | Path):
+def iter_orders(path: str | Path, id_range: Tuple[int, int] | None = None) -> Iterator[Tuple[int, int, List[int]]]:
     """
-    Load a square adjacency matrix from a file.
-    Supports text (.txt) with a header line, or NumPy binary (.npy).
+    Stream the orders of an orders file, one two-line record at a time.
 
     Text format expected:
-        - First line: number of locations (optional, can be used for verification)
-        - Remaining lines: square matrix (space, tab, or comma separated)
+        - First line: number of orders
+        - Then for each order: a line "id volume nb_locations" followed by a line with its locations
 
     Args:
-        path (str | Path): Path to the matrix file.
+        path (str | Path): Path to the orders file.
+        id_range (tuple[int, int] | None): only yield orders with lo <= id < hi
 
-    Returns:
-        np.ndarray: Loaded square matrix.
+    Yields:
+        tuple[int, int, List[int]]: (id, volume, locations)
 
     Raises:
         FileNotFoundError: If the file does not exist.
-        ValueError: If the matrix is not square or size doesn't match header.
+        ValueError: If a record is truncated.
     """
 
     # Convert string paths to Path objects for cross-platform safety
@@ -103,33 +104,86 @@ def load_orders(path: str | Path):
     # Ensure the file exists
     if not path.exists():
         raise FileNotFoundError(f"Fichier introuvable : {path}")
-    
-    # Text format: handle header line
+
     with path.open("r", encoding="utf-8") as f:
-        lines = f.readlines()
-        
-    lines = [line.strip() for line in lines]
-    
-    orders: List[Dict[str, object]] = []
-    for i in range(1, len(lines), 2):
-        info = lines[i].split()
-        number = int(info[0])
-        volume = int(info[1])
-        nb_locations = int(info[2])
-
-        spots = lines[i+1].split()
-        locations_list = []
-        for i in range(nb_locations):
-            locations_list.append(spots[i])
-        locations_list = list(map(int, locations_list))
-        locations_set = set(locations_list)
+        # header: number of orders
+        f.readline()
+
+        for info_line in f:
+            info = info_line.split()
+            if not info:
+                continue
+            spots_line = f.readline()
+            if not spots_line:
+                raise ValueError(f"Order {info[0]}: missing locations line")
+
+            number = int(info[0])
+            if id_range is not None and not (id_range[0] <= number < id_range[1]):
+                continue
+            volume = int(info[1])
+            nb_locations = int(info[2])
+
+            spots = spots_line.split()
+            if len(spots) < nb_locations:
+                raise ValueError(f"Order {number}: {len(spots)} locations listed, expected {nb_locations}")
+            locations_list = list(map(int, spots[:nb_locations]))
+            yield number, volume, locations_list
+
+def load_orders_compact(path: str | Path, id_range: Tuple[int, int] | None = None) -> CompactOrders:
+    """
+    Load orders into compact array-backed storage (offsets + flat int32 locations + volumes),
+    streaming the file so that only the selected orders are ever held in memory.
 
+    Args:
+        path (str | Path): Path to the orders file.
+        id_range (tuple[int, int] | None): only load orders with lo <= id < hi (e.g. one wave)
+
+    Returns:
+        CompactOrders: ids, volumes, offsets and flat locations of the loaded orders
+    """
+    ids = array("q")
+    volumes = array("q")
+    offsets = array("q", [0])
+    locations = array("i")
+
+    for number, volume, locations_list in iter_orders(path, id_range):
+        ids.append(number)
+        volumes.append(volume)
+        locations.extend(locations_list)
+        offsets.append(len(locations))
+
+    return CompactOrders(
+        ids=np.frombuffer(ids, dtype=np.int64),
+        volumes=np.frombuffer(volumes, dtype=np.int64),
+        offsets=np.frombuffer(offsets, dtype=np.int64),
+        locations=np.frombuffer(locations, dtype=np.int32),
+    )
+
+def load_orders(path: str | Path, id_range: Tuple[int, int] | None = None) -> List[Dict[str, object]]:
+    """
+    Load the orders of an orders file as a list of dictionaries
+    (id, volume, nb_locations, locations_list, locations_set).
+    The file is streamed (see iter_orders), it is never read in memory at once.
+
+    Args:
+        path (str | Path): Path to the orders file.
+        id_range (tuple[int, int] | None): only load orders with lo <= id < hi
+
+    Returns:
+        List[Dict[str, object]]: one dictionary per order
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+    """
+
+    orders: List[Dict[str, object]] = []
+    for number, volume, locations_list in iter_orders(path, id_range):
         orders.append({
             "id": number,
             "volume": volume,
-            "nb_locations": nb_locations,
+            "nb_locations": len(locations_list),
             "locations_list": locations_list,
-            "locations_set": locations_set
+            "locations_set": set(locations_list)
         })
 
     return orders
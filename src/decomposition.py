@@ -0,0 +1,338 @@
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+import heuristics as hr
+import instance as ins
+import instrumentation as instr
+import solver_models as sm
+import utils as ut
+
+logger = logging.getLogger(__name__)
+
+def _distances(adj_matrix, sources: np.ndarray, locations: np.ndarray) -> np.ndarray:
+    """
+    Distances in both directions (the matrix may be asymmetric) between a few sources and the
+    locations, read as blocks of rows and columns of the matrix.
+    """
+    return (np.asarray(adj_matrix[np.ix_(sources, locations)], dtype=np.float64)
+            + np.asarray(adj_matrix[np.ix_(locations, sources)], dtype=np.float64).T)
+
+def location_zones(adj_matrix, nb_zones: int, locations=None, iterations: int = 10, sample_size: int = 256,
+                   seed: int = 0) -> np.ndarray:
+    """
+    Warehouse zones derived from the distance matrix: k-medoids of the locations
+    (farthest-point initialization, then alternate assignment to the closest medoid and
+    medoid update).
+
+    Only the rows and columns of the medoids are read from the matrix (nb_zones x locations
+    blocks); the medoid of a zone is chosen among sample_size of its locations, by their
+    distances to sample_size of its locations, so no square block of the matrix is copied.
+
+    Args:
+        adj_matrix (np.ndarray): distance matrix
+        nb_zones (int): number of zones
+        locations: locations to cluster (all if None)
+        iterations (int): maximum number of assignment / update rounds
+        sample_size (int): locations of a zone considered by the medoid update
+        seed (int): seed of the first medoid and of the samples
+
+    Returns:
+        np.ndarray: zone of each location (-1 for the locations not clustered)
+    """
+    nb_locations = len(adj_matrix)
+    locations = np.arange(nb_locations) if locations is None else np.asarray(locations, dtype=np.int64)
+    zones = np.full(nb_locations, -1, dtype=np.int64)
+    if not len(locations):
+        return zones
+    rng = np.random.default_rng(seed)
+    nb_zones = min(nb_zones, len(locations))
+
+    # medoids are positions in locations
+    medoids = [int(rng.integers(len(locations)))]
+    closest = _distances(adj_matrix, locations[medoids], locations)[0]
+    while len(medoids) < nb_zones:
+        medoids.append(int(np.argmax(closest)))
+        np.minimum(closest, _distances(adj_matrix, locations[medoids[-1:]], locations)[0], out=closest)
+    medoids = np.asarray(medoids)
+
+    for _ in range(iterations):
+        assignment = np.argmin(_distances(adj_matrix, locations[medoids], locations), axis=0)
+        new_medoids = medoids.copy()
+        for z in range(nb_zones):
+            members = np.flatnonzero(assignment == z)
+            if len(members) > sample_size:
+                members = rng.choice(members, size=sample_size, replace=False)
+            if len(members):
+                new_medoids[z] = members[np.argmin(_distances(adj_matrix, locations[members], locations[members]).sum(axis=1))]
+        if np.array_equal(new_medoids, medoids):
+            break
+        medoids = new_medoids
+
+    zones[locations] = np.argmin(_distances(adj_matrix, locations[medoids], locations), axis=0)
+    return zones
+
+def zone_clusters(data, nb_zones: int | None = None, max_cluster_size: int = 200) -> List[List[int]]:
+    """
+    Clusters of orders by warehouse zone: every order goes to the zone (location_zones) of most
+    of its locations, locations visited by every order ignored. Zones with more than
+    max_cluster_size orders are cut into chunks of orders sorted by first location.
+
+    Args:
+        data (Dict): instance data built by main.load_data
+        nb_zones (int | None): number of zones (enough for clusters of max_cluster_size orders if None)
+        max_cluster_size (int): maximum number of orders of a cluster
+
+    Returns:
+        List[List[int]]: sorted orders of each cluster
+    """
+    ifloc = data["ifloc"]
+    nb_orders = data["nb_orders"]
+    universal = ifloc.universal_locations()
+    if nb_zones is None:
+        nb_zones = max(1, int(np.ceil(nb_orders / max_cluster_size)))
+
+    visited = np.flatnonzero(np.diff(ifloc.loc_ptr) > 0)
+    zones = location_zones(data["adj_matrix"], nb_zones, visited[~np.isin(visited, universal)])
+
+    # votes of the locations of each order for their zone
+    rows = np.repeat(np.arange(nb_orders), np.diff(ifloc.order_ptr))
+    order_zones = zones[ifloc.order_locs]
+    counted = order_zones >= 0
+    nb_zones = int(zones.max()) + 1 if counted.any() else 1
+    votes = np.bincount(rows[counted] * nb_zones + order_zones[counted], minlength=nb_orders * nb_zones).reshape(nb_orders, nb_zones)
+    zone_of = np.argmax(votes, axis=1)
+
+    first_location = np.full(nb_orders, len(data["adj_matrix"]), dtype=np.int64)
+    np.minimum.at(first_location, rows[counted], ifloc.order_locs[counted].astype(np.int64))
+
+    clusters = []
+    for z in range(nb_zones):
+        members = np.flatnonzero(zone_of == z)
+        members = members[np.argsort(first_location[members], kind="stable")]
+        for start in range(0, len(members), max_cluster_size):
+            clusters.append(sorted(members[start:start + max_cluster_size].tolist()))
+    return [cluster for cluster in clusters if cluster]
+
+def affinity_clusters(data, max_cluster_size: int = 200, top_k: int = 10) -> List[List[int]]:
+    """
+    Clusters of orders by graph clustering on the shared locations: the pairs of the top_k
+    neighbours of every order (locations visited by every order ignored) are merged by
+    decreasing number of shared locations, as long as the merged cluster has at most
+    max_cluster_size orders (union-find). The remaining small clusters are then packed
+    together, in order, up to max_cluster_size orders.
+
+    Args:
+        data (Dict): instance data built by main.load_data
+        max_cluster_size (int): maximum number of orders of a cluster
+        top_k (int): neighbours of each order considered
+
+    Returns:
+        List[List[int]]: sorted orders of each cluster
+    """
+    ifloc = data["ifloc"]
+    nb_orders = data["nb_orders"]
+    universal = ifloc.universal_locations()
+    incidence = ifloc.without_locations(universal) if len(universal) else ifloc
+    rows, cols, counts = ut.shared_locations(incidence, top_k=top_k)
+
+    parent = list(range(nb_orders))
+    size = [1] * nb_orders
+
+    def find(o: int) -> int:
+        while parent[o] != o:
+            parent[o] = parent[parent[o]]
+            o = parent[o]
+        return o
+
+    for k in np.argsort(-counts, kind="stable").tolist():
+        r, r2 = find(int(rows[k])), find(int(cols[k]))
+        if r != r2 and size[r] + size[r2] <= max_cluster_size:
+            if size[r] < size[r2]:
+                r, r2 = r2, r
+            parent[r2] = r
+            size[r] += size[r2]
+
+    groups: Dict[int, List[int]] = {}
+    for o in range(nb_orders):
+        groups.setdefault(find(o), []).append(o)
+
+    # pack the clusters (largest first) into clusters of at most max_cluster_size orders
+    clusters: List[List[int]] = []
+    for group in sorted(groups.values(), key=lambda group: (-len(group), group[0])):
+        if clusters and len(clusters[-1]) + len(group) <= max_cluster_size:
+            clusters[-1].extend(group)
+        else:
+            clusters.append(list(group))
+    return [sorted(cluster) for cluster in clusters]
+
+def cluster_instance(data, orders: List[int]) -> ins.Instance:
+    """
+    Sub-instance of the given orders: only the locations they visit are kept, renumbered in
+    increasing order (so the departure 0 and the arrival stay first and last).
+    """
+    ifloc = data["ifloc"]
+    vol = data["vol"]
+    locations = [ifloc.locations_of(o) for o in orders]
+    used = np.unique(np.concatenate(locations)) if orders else np.zeros(0, dtype=np.int64)
+
+    offsets = np.zeros(len(orders) + 1, dtype=np.int64)
+    np.cumsum([len(locs) for locs in locations], out=offsets[1:])
+    flat = np.searchsorted(used, np.concatenate(locations)).astype(np.int32) if orders else np.zeros(0, dtype=np.int32)
+    order_set = ins.OrderSet(np.asarray(orders, dtype=np.int64), np.asarray([vol[o] for o in orders], dtype=np.int64), offsets, flat)
+    adj_matrix = np.asarray(data["adj_matrix"][np.ix_(used, used)])
+    return ins.Instance(adj_matrix, order_set, data["max_nb_orders"], data["max_vol"])
+
+def batch_cluster(sub: ins.Instance, batching: str = "greedy", time_limit: float | None = None) -> List[List[int]]:
+    """
+    Batching of one cluster (numbered as in the original instance, see cluster_instance).
+    Runs in a worker process.
+
+    Args:
+        sub (Instance): sub-instance of the cluster
+        batching (str): "greedy" (greedy_batching + local_search_batching), "route_length"
+            (route_length_batching) or "model" (model_batching_compact started from greedy_batching,
+            for small clusters: CBC may overrun time_limit in its root node on large ones)
+        time_limit (float | None): time limit of the local search or of the model
+
+    Returns:
+        List[List[int]]: non-empty batches of the cluster, with the original order numbers
+    """
+    if batching == "greedy":
+        batches = hr.local_search_batching(sub, hr.greedy_batching(sub), time_limit=time_limit or 0.5)
+    elif batching == "route_length":
+        batches = hr.route_length_batching(sub, time_limit=time_limit or 1.0)
+    elif batching == "model":
+        batches = sm.model_batching(sub, compact=True, initial_batches=hr.greedy_batching(sub),
+                                    solver=sm.make_solver(time_limit=time_limit, msg=False, warm_start=True))
+    else:
+        raise ValueError(f"Unknown cluster batching: {batching}")
+
+    ids = sub.orders.ids
+    return [sorted(int(ids[o]) for o in orders) for orders in batches.values() if orders]
+
+def merge_underfilled(data, batches: List[List[int]]) -> List[List[int]]:
+    """
+    Repair pass across cluster borders: merge batches whose union respects max_nb_orders and
+    max_vol, starting with the smallest ones. A batch is merged into the batch sharing the
+    most locations with it (inverted index of ifloc, locations visited by every order
+    ignored), or else into the fullest batch it fits in.
+
+    Returns:
+        List[List[int]]: the merged batches
+    """
+    ifloc = data["ifloc"]
+    vol = data["vol"]
+    max_nb_orders = data["max_nb_orders"]
+    max_vol = data["max_vol"]
+    universal = ifloc.universal_locations()
+
+    batches = {p: list(orders) for p, orders in enumerate(batches) if orders}
+    load = {p: sum(vol[o] for o in orders) for p, orders in batches.items()}
+    batch_of = {o: p for p, orders in batches.items() for o in orders}
+
+    def fits(p: int, q: int) -> bool:
+        return len(batches[p]) + len(batches[q]) <= max_nb_orders and load[p] + load[q] <= max_vol
+
+    for p in sorted(batches, key=lambda p: (len(batches[p]), load[p])):
+        if p not in batches or len(batches[p]) >= max_nb_orders:
+            continue
+        gain: Dict[int, int] = {}
+        for o in batches[p]:
+            neighbours, counts = ifloc.neighbours(o, exclude=universal)
+            for o2, count in zip(neighbours.tolist(), counts.tolist()):
+                q = batch_of[o2]
+                if q != p:
+                    gain[q] = gain.get(q, 0) + count
+        candidates = [q for q in gain if fits(p, q)]
+        if candidates:
+            target = max(candidates, key=lambda q: (gain[q], -q))
+        else:
+            candidates = [q for q in batches if q != p and fits(p, q)]
+            if not candidates:
+                continue
+            target = max(candidates, key=lambda q: (load[q], len(batches[q]), -q))
+
+        batches[target].extend(batches[p])
+        load[target] += load.pop(p)
+        for o in batches.pop(p):
+            batch_of[o] = target
+
+    return [sorted(orders) for orders in batches.values()]
+
+def shared_objective(data, batches: List[List[int]]) -> int:
+    """
+    Objective of model_batching (batching_objective) computed from the incidence: a location
+    visited by c orders of a batch counts for the c * (c - 1) / 2 pairs of these orders.
+    Avoids common_locations, which holds every overlapping pair of a large instance.
+    """
+    ifloc = data["ifloc"]
+    orders = [o for batch in batches for o in batch]
+    if not orders:
+        return 0
+    locations = [ifloc.locations_of(o) for o in orders]
+    batch_index = np.repeat(np.arange(len(batches)), [len(batch) for batch in batches])
+    rows = np.repeat(batch_index, [len(locs) for locs in locations])
+    _, counts = np.unique(rows * ifloc.nb_locations + np.concatenate(locations), return_counts=True)
+    return int((counts * (counts - 1) // 2).sum())
+
+def decomposed_batching(data, clustering: str = "affinity", batching: str = "greedy", max_cluster_size: int = 200,
+                        nb_zones: int | None = None, workers: int | None = None, time_limit: float | None = None,
+                        repair: bool = True) -> Tuple[Dict[int, List[int]], Dict[str, float]]:
+    """
+    Batching of very large waves by decomposition:
+        1. the orders are partitioned into clusters of at most max_cluster_size orders, by
+           warehouse zone (zone_clusters) or by shared locations (affinity_clusters),
+        2. every cluster is batched independently (batch_cluster), over a process pool,
+        3. under-filled batches are merged across cluster borders (merge_underfilled).
+
+    Args:
+        data (Dict): instance data built by main.load_data
+        clustering (str): "affinity" or "zone"
+        batching (str): batching of each cluster, see batch_cluster
+        max_cluster_size (int): maximum number of orders of a cluster
+        nb_zones (int | None): number of zones of the zone clustering
+        workers (int | None): number of worker processes (None: one per CPU, 1: no pool)
+        time_limit (float | None): time limit of each cluster
+        repair (bool): run the merge pass
+
+    Returns:
+        tuple[Dict, Dict]: {picker: list of assigned orders} (same shape as model_batching), and
+            statistics: clusters, batches before and after the repair, objective, time
+    """
+    start = time.perf_counter()
+
+    with instr.stage("cluster_orders", clustering=clustering) as entry:
+        if clustering == "affinity":
+            clusters = affinity_clusters(data, max_cluster_size)
+        elif clustering == "zone":
+            clusters = zone_clusters(data, nb_zones, max_cluster_size)
+        else:
+            raise ValueError(f"Unknown clustering: {clustering}")
+        entry["clusters"] = len(clusters)
+
+    # only the sub-instances are sent to the workers
+    subs = [cluster_instance(data, cluster) for cluster in clusters]
+    with instr.stage("batch_clusters", batching=batching, workers=workers):
+        if workers == 1:
+            results = [batch_cluster(sub, batching, time_limit) for sub in subs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(batch_cluster, subs, [batching] * len(subs), [time_limit] * len(subs)))
+    batches = [orders for result in results for orders in result]
+    nb_before = len(batches)
+
+    if repair:
+        with instr.stage("merge_underfilled"):
+            batches = merge_underfilled(data, batches)
+
+    stats = {"clusters": len(clusters), "largest_cluster": max((len(cluster) for cluster in clusters), default=0),
+             "batches_before_repair": nb_before, "batches": len(batches),
+             "objective": shared_objective(data, batches),
+             "time": time.perf_counter() - start}
+    logger.info("Decomposed batching: %s", stats)
+
+    return hr.pad_batches(batches, max(data["max_pickers"], len(batches))), stats
@@ -0,0 +1,368 @@
+import logging
+import random
+import time
+from typing import List, Dict
+
+import numpy as np
+
+import routing as rt
+
+logger = logging.getLogger(__name__)
+
+def shared(a, o: int, o2: int) -> int:
+    """
+    Number of locations shared by two orders, whatever their order in the key of a.
+    Only pairs (o, o2) with o < o2 are stored in common_locations.
+    """
+    if o > o2:
+        o, o2 = o2, o
+    return a.get((o, o2), 0)
+
+def batching_objective(batches: Dict[int, List[int]], a) -> int:
+    """
+    Objective of model_batching: sum of the shared locations of every pair of orders in the same batch.
+    """
+    total = 0
+    for orders in batches.values():
+        for i, o in enumerate(orders):
+            for o2 in orders[i + 1:]:
+                total += shared(a, o, o2)
+    return total
+
+def pad_batches(batches: List[List[int]], max_pickers: int) -> Dict[int, List[int]]:
+    """
+    Number the batches 0..k-1 and add empty batches up to max_pickers, like the output of model_batching.
+    """
+    padded = {p: orders for p, orders in enumerate(batches)}
+    for p in range(len(batches), max_pickers):
+        padded[p] = []
+    return padded
+
+def greedy_batching(data) -> Dict[int, List[int]]:
+    """
+    Seed-order + best-overlap insertion heuristic for the batching problem.
+
+    Orders are taken as seeds by decreasing number of locations. A batch is grown from
+    its seed by repeatedly inserting the unassigned order sharing the most locations
+    with the batch, as long as max_nb_orders and max_vol are respected. Overlaps are read
+    from the inverted index of ifloc, locations visited by every order are ignored.
+    When no overlapping order fits any more, the batch is filled with the next seeds that fit.
+
+    Args:
+        data (Dict): instance data built by main.load_data
+
+    Returns:
+        Dict[int, List[int]]: {picker: list of assigned orders}, same shape as model_batching
+    """
+    ifloc = data["ifloc"]
+    vol = data["vol"]
+    nb_orders = data["nb_orders"]
+    max_nb_orders = data["max_nb_orders"]
+    max_vol = data["max_vol"]
+
+    universal = ifloc.universal_locations()
+    nb_locs = np.diff(ifloc.order_ptr)
+    seeds = sorted(range(nb_orders), key=lambda o: (-nb_locs[o], -vol[o], o))
+
+    assigned = [False] * nb_orders
+    batches = []
+    next_seed = 0
+
+    for seed in seeds:
+        if assigned[seed]:
+            continue
+        batch = [seed]
+        batch_vol = vol[seed]
+        assigned[seed] = True
+
+        # gain[o] = number of locations o shares with the current batch
+        gain = {}
+        new_order = seed
+        while len(batch) < max_nb_orders:
+            neighbours, counts = ifloc.neighbours(new_order, exclude=universal)
+            for o, count in zip(neighbours.tolist(), counts.tolist()):
+                if not assigned[o]:
+                    gain[o] = gain.get(o, 0) + count
+
+            best, best_gain = None, 0
+            for o, g in list(gain.items()):
+                if assigned[o]:
+                    del gain[o]
+                elif g > best_gain and batch_vol + vol[o] <= max_vol:
+                    best, best_gain = o, g
+
+            if best is None:
+                # no overlapping order fits: fill with the next seeds that fit
+                while next_seed < nb_orders and assigned[seeds[next_seed]]:
+                    next_seed += 1
+                i = next_seed
+                while i < nb_orders:
+                    o = seeds[i]
+                    if not assigned[o] and batch_vol + vol[o] <= max_vol:
+                        best = o
+                        break
+                    i += 1
+                if best is None:
+                    break
+
+            batch.append(best)
+            batch_vol += vol[best]
+            assigned[best] = True
+            gain.pop(best, None)
+            new_order = best
+
+        batches.append(sorted(batch))
+
+    return pad_batches(batches, data["max_pickers"])
+
+def _exchange_delta(batches, a, moved_out: List[int], p: int, moved_in: List[int], q: int) -> int:
+    """
+    Variation of the batching objective when the orders moved_out leave batch p for batch q
+    and the orders moved_in leave batch q for batch p. Only the links of the moved orders are read.
+    """
+    stay_p = [o for o in batches[p] if o not in moved_out]
+    stay_q = [o for o in batches[q] if o not in moved_in]
+    delta = 0
+    for o in moved_out:
+        delta += sum(shared(a, o, o2) for o2 in stay_q) - sum(shared(a, o, o2) for o2 in stay_p)
+    for o in moved_in:
+        delta += sum(shared(a, o, o2) for o2 in stay_p) - sum(shared(a, o, o2) for o2 in stay_q)
+    return delta
+
+def local_search_batching(data, batches: Dict[int, List[int]], time_limit: float = 1.0, nb_random_pickers: int = 3, seed: int = 0) -> Dict[int, List[int]]:
+    """
+    Improve a batching solution (from model_batching or any heuristic) by local search.
+
+    Neighbourhoods, explored in first-improvement order:
+        - relocate: move one order to another picker
+        - swap: exchange one order of a picker with one order of another picker
+        - 2-exchange: exchange two orders of a picker with two orders of another picker
+
+    Moves are evaluated with incremental deltas of the model_batching objective (only the
+    shared locations of the moved orders are read), and max_nb_orders / max_vol are
+    respected. Target pickers of an order are those holding its neighbours in the inverted
+    index of ifloc, plus a few random pickers.
+
+    Args:
+        data (Dict): instance data built by main.load_data
+        batches (Dict): {picker: list of assigned orders}, starting solution
+        time_limit (float): time budget in seconds
+        nb_random_pickers (int): random target pickers tried for each order
+        seed (int): seed of the random generator
+
+    Returns:
+        Dict[int, List[int]]: improved {picker: list of assigned orders}
+    """
+    a = data["common_locations"]
+    vol = data["vol"]
+    ifloc = data["ifloc"]
+    max_nb_orders = data["max_nb_orders"]
+    max_vol = data["max_vol"]
+
+    deadline = time.perf_counter() + time_limit
+    rng = random.Random(seed)
+    universal = ifloc.universal_locations()
+
+    batches = {p: list(orders) for p, orders in batches.items()}
+    pickers = list(batches)
+    batch_of = {o: p for p, orders in batches.items() for o in orders}
+    load = {p: sum(vol[o] for o in orders) for p, orders in batches.items()}
+    neighbours = {}
+
+    objective = batching_objective(batches, a)
+    logger.debug("Local search start: objective %s", objective)
+
+    def fits(p: int, moved_in: List[int], moved_out: List[int]) -> bool:
+        size = len(batches[p]) + len(moved_in) - len(moved_out)
+        volume = load[p] + sum(vol[o] for o in moved_in) - sum(vol[o] for o in moved_out)
+        return size <= max_nb_orders and volume <= max_vol
+
+    def apply(moved_out: List[int], p: int, moved_in: List[int], q: int):
+        for o in moved_out:
+            batches[p].remove(o)
+            batches[q].append(o)
+            batch_of[o] = q
+        for o in moved_in:
+            batches[q].remove(o)
+            batches[p].append(o)
+            batch_of[o] = p
+        volume = sum(vol[o] for o in moved_out) - sum(vol[o] for o in moved_in)
+        load[p] -= volume
+        load[q] += volume
+
+    def first_improving_move(o: int):
+        """First improving move involving order o, or None (also once the deadline is passed)."""
+        p = batch_of[o]
+        if o not in neighbours:
+            neighbours[o] = ifloc.neighbours(o, exclude=universal)[0].tolist()
+        targets = {batch_of[o2] for o2 in neighbours[o]}
+        targets.update(rng.sample(pickers, min(nb_random_pickers, len(pickers))))
+        targets.discard(p)
+
+        for q in targets:
+            if time.perf_counter() >= deadline:
+                return None
+            # relocate
+            if fits(q, [o], []) and _exchange_delta(batches, a, [o], p, [], q) > 0:
+                return [o], p, [], q
+            # swap
+            for o2 in batches[q]:
+                if fits(q, [o], [o2]) and fits(p, [o2], [o]) and _exchange_delta(batches, a, [o], p, [o2], q) > 0:
+                    return [o], p, [o2], q
+            # 2-exchange
+            for o1 in batches[p]:
+                if o1 == o:
+                    continue
+                if time.perf_counter() >= deadline:
+                    return None
+                for i, o2 in enumerate(batches[q]):
+                    for o3 in batches[q][i + 1:]:
+                        out, into = [o, o1], [o2, o3]
+                        if fits(q, out, into) and fits(p, into, out) and _exchange_delta(batches, a, out, p, into, q) > 0:
+                            return out, p, into, q
+        return None
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        orders = list(batch_of)
+        rng.shuffle(orders)
+        for o in orders:
+            if time.perf_counter() >= deadline:
+                break
+            move = first_improving_move(o)
+            if move is not None:
+                objective += _exchange_delta(batches, a, *move)
+                apply(*move)
+                improved = True
+
+    logger.debug("Local search end: objective %s", objective)
+
+    return {p: sorted(orders) for p, orders in batches.items()}
+
+def route_length_batching(data, estimator: rt.RouteLengthEstimator | None = None, nb_candidates: int = 10,
+                          time_limit: float = 1.0, seed: int = 0) -> Dict[int, List[int]]:
+    """
+    Batching heuristic minimizing the estimated total route length instead of maximizing
+    the shared locations.
+
+    Construction (savings): orders are taken as seeds by decreasing route length of their own.
+    A batch is grown by inserting the candidate order with the largest saving
+    cost(o) - (cost(batch + o) - cost(batch)), i.e. the order whose own route is best absorbed
+    by the batch, as long as the saving is not negative and max_nb_orders / max_vol are
+    respected. Candidates are the nb_candidates unassigned orders sharing the most locations
+    with the batch (inverted index of ifloc) plus the next nb_candidates seeds.
+    Improvement: orders are relocated to the batches of their neighbours while it shortens
+    the estimated total length, until time_limit.
+
+    Route lengths come from estimator (a routing.RouteLengthEstimator, memoized by location set).
+
+    Args:
+        data (Dict): instance data built by main.load_data
+        estimator (RouteLengthEstimator | None): route-length estimator, built on data if None
+        nb_candidates (int): candidates evaluated per insertion, from each source
+        time_limit (float): time budget of the relocation phase in seconds
+        seed (int): seed of the random generator
+
+    Returns:
+        Dict[int, List[int]]: {picker: list of assigned orders}, same shape as model_batching
+    """
+    ifloc = data["ifloc"]
+    vol = data["vol"]
+    nb_orders = data["nb_orders"]
+    max_nb_orders = data["max_nb_orders"]
+    max_vol = data["max_vol"]
+
+    if estimator is None:
+        estimator = rt.RouteLengthEstimator(data["adj_matrix"], ifloc)
+    deadline = time.perf_counter() + time_limit
+    rng = random.Random(seed)
+    universal = ifloc.universal_locations()
+
+    own = [estimator.batch_cost([o]) for o in range(nb_orders)]
+    seeds = sorted(range(nb_orders), key=lambda o: (-own[o], o))
+
+    assigned = [False] * nb_orders
+    batches = []
+    next_seed = 0
+
+    for seed_order in seeds:
+        if assigned[seed_order]:
+            continue
+        batch = [seed_order]
+        batch_vol = vol[seed_order]
+        batch_cost = own[seed_order]
+        assigned[seed_order] = True
+
+        gain = {}
+        new_order = seed_order
+        while len(batch) < max_nb_orders:
+            neighbours, counts = ifloc.neighbours(new_order, exclude=universal)
+            for o, count in zip(neighbours.tolist(), counts.tolist()):
+                if not assigned[o]:
+                    gain[o] = gain.get(o, 0) + count
+            for o in [o for o in gain if assigned[o]]:
+                del gain[o]
+
+            candidates = sorted(gain, key=lambda o: -gain[o])[:nb_candidates]
+            while next_seed < nb_orders and assigned[seeds[next_seed]]:
+                next_seed += 1
+            candidates += [o for o in seeds[next_seed:next_seed + nb_candidates] if o not in gain]
+
+            best, best_saving, best_cost = None, 0.0, None
+            for o in candidates:
+                if assigned[o] or batch_vol + vol[o] > max_vol:
+                    continue
+                cost = estimator.batch_cost(batch + [o])
+                saving = own[o] - (cost - batch_cost)
+                if best is None or saving > best_saving:
+                    best, best_saving, best_cost = o, saving, cost
+            if best is None or best_saving < 0:
+                break
+
+            batch.append(best)
+            batch_vol += vol[best]
+            batch_cost = best_cost
+            assigned[best] = True
+            gain.pop(best, None)
+            new_order = best
+
+        batches.append(sorted(batch))
+
+    # relocation: move an order to the batch of one of its neighbours while the total length decreases
+    batch_of = {o: p for p, orders in enumerate(batches) for o in orders}
+    load = [sum(vol[o] for o in orders) for orders in batches]
+    cost = [estimator.batch_cost(orders) for orders in batches]
+    logger.debug("Route-length batching construction: %s batches, length %s", len(batches), sum(cost))
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        orders = list(range(nb_orders))
+        rng.shuffle(orders)
+        for o in orders:
+            if time.perf_counter() >= deadline:
+                break
+            p = batch_of[o]
+            rest = [o2 for o2 in batches[p] if o2 != o]
+            rest_cost = estimator.batch_cost(rest) if rest else 0.0
+            targets = {batch_of[o2] for o2 in ifloc.neighbours(o, exclude=universal)[0].tolist()}
+            targets.discard(p)
+            for q in targets:
+                if len(batches[q]) >= max_nb_orders or load[q] + vol[o] > max_vol:
+                    continue
+                new_cost = estimator.batch_cost(batches[q] + [o])
+                if rest_cost + new_cost < cost[p] + cost[q] - 1e-9:
+                    batches[p] = rest
+                    batches[q] = sorted(batches[q] + [o])
+                    load[p] -= vol[o]
+                    load[q] += vol[o]
+                    cost[p], cost[q] = rest_cost, new_cost
+                    batch_of[o] = q
+                    improved = True
+                    break
+
+    batches = [orders for orders in batches if orders]
+    logger.debug("Route-length batching end: %s batches, length %s", len(batches), sum(cost))
+
+    return pad_batches(batches, max(data["max_pickers"], len(batches)))
@@ -0,0 +1,210 @@
+from functools import cached_property
+from typing import List, Dict, Any, Iterator
+
+import numpy as np
+
+import data_loader as dl
+import instrumentation as instr
+import utils as ut
+
+class Order:
+    """
+    Lightweight view on one order of an OrderSet (no data is copied).
+
+    Exposes attributes (id, volume, nb_locations, locations) and, for the code written
+    against the former per-order dictionaries, the keys "id", "volume", "nb_locations",
+    "locations_list" and "locations_set".
+    """
+
+    __slots__ = ("_orders", "_index")
+
+    KEYS = ("id", "volume", "nb_locations", "locations_list", "locations_set")
+
+    def __init__(self, orders: "OrderSet", index: int):
+        self._orders = orders
+        self._index = index
+
+    @property
+    def id(self) -> int:
+        return int(self._orders.ids[self._index])
+
+    @property
+    def volume(self) -> int:
+        return int(self._orders.volumes[self._index])
+
+    @property
+    def locations(self) -> np.ndarray:
+        offsets = self._orders.offsets
+        return self._orders.locations[offsets[self._index]:offsets[self._index + 1]]
+
+    @property
+    def nb_locations(self) -> int:
+        offsets = self._orders.offsets
+        return int(offsets[self._index + 1] - offsets[self._index])
+
+    def keys(self):
+        return set(self.KEYS)
+
+    def __getitem__(self, key: str):
+        if key == "locations_list":
+            return self.locations.tolist()
+        if key == "locations_set":
+            return set(self.locations.tolist())
+        if key in self.KEYS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self) -> str:
+        return f"Order(id={self.id}, volume={self.volume}, locations={self.locations.tolist()})"
+
+class OrderSet:
+    """
+    Orders stored in flat NumPy arrays: the locations of order k are
+    locations[offsets[k]:offsets[k + 1]]. Indexing returns an Order view.
+    """
+
+    __slots__ = ("ids", "volumes", "offsets", "locations")
+
+    def __init__(self, ids: np.ndarray, volumes: np.ndarray, offsets: np.ndarray, locations: np.ndarray):
+        self.ids = ids
+        self.volumes = volumes
+        self.offsets = offsets
+        self.locations = locations
+
+    @classmethod
+    def from_compact(cls, compact: dl.CompactOrders) -> "OrderSet":
+        """Wrap the arrays of data_loader.load_orders_compact."""
+        return cls(compact.ids, compact.volumes, compact.offsets, compact.locations)
+
+    @classmethod
+    def from_dicts(cls, orders: List[Dict[str, object]]) -> "OrderSet":
+        """Convert the per-order dictionaries of data_loader.load_orders."""
+        lengths = np.fromiter((len(order["locations_list"]) for order in orders), dtype=np.int64, count=len(orders))
+        offsets = np.zeros(len(orders) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        locations = np.fromiter((loc for order in orders for loc in order["locations_list"]), dtype=np.int32, count=int(offsets[-1]))
+        ids = np.fromiter((order["id"] for order in orders), dtype=np.int64, count=len(orders))
+        volumes = np.fromiter((order["volume"] for order in orders), dtype=np.int64, count=len(orders))
+        return cls(ids, volumes, offsets, locations)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index: int) -> Order:
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+        return Order(self, index % len(self))
+
+    def __iter__(self) -> Iterator[Order]:
+        return (Order(self, k) for k in range(len(self)))
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the arrays."""
+        return self.ids.nbytes + self.volumes.nbytes + self.offsets.nbytes + self.locations.nbytes
+
+class Instance:
+    """
+    Instance of the batching / picking problem.
+
+    Holds the loaded inputs (distance matrix, orders, capacity constraints). Derived fields
+    (ifloc, common_locations, picker bounds, locations_pickers once batches are set, ...)
+    are computed on first access and memoized.
+    It can be used wherever the data dictionary of main.load_data is expected:
+    instance["vol"], instance["ifloc"], ... and instance["batches"] = ... work as with the dict.
+    """
+
+    # keys available through instance[key], as in the data dictionary
+    KEYS = ("adj_matrix", "ifloc", "vol", "nb_locations", "nb_orders", "min_pickers",
+            "max_pickers", "max_nb_orders", "max_vol", "common_locations")
+
+    def __init__(self, adj_matrix: np.ndarray, orders: OrderSet, max_nb_orders: int, max_vol: int):
+        self.adj_matrix = adj_matrix
+        self.orders = orders
+        self.max_nb_orders = max_nb_orders
+        self.max_vol = max_vol
+        # extra entries set by the caller (batches, locations_pickers, ...)
+        self._extra: Dict[str, Any] = {}
+        # shared locations per top_k, see similarity()
+        self._similarity: Dict[int | None, ut.SharedLocations] = {}
+
+    @property
+    def nb_locations(self) -> int:
+        return len(self.adj_matrix)
+
+    @property
+    def nb_orders(self) -> int:
+        return len(self.orders)
+
+    @cached_property
+    def vol(self) -> List[int]:
+        return self.orders.volumes.tolist()
+
+    @cached_property
+    def ifloc(self) -> ut.LocOrderIncidence:
+        with instr.stage("ifloc"):
+            return ut.LocOrderIncidence.from_compact(self.nb_locations, self.orders.offsets, self.orders.locations)
+
+    @cached_property
+    def common_locations(self) -> ut.SharedLocations:
+        return self.similarity()
+
+    def similarity(self, top_k: int | None = None) -> ut.SharedLocations:
+        """
+        Shared locations between orders (all overlapping pairs, or the top_k neighbours of
+        each order), memoized per top_k.
+        """
+        if top_k is None and "common_locations" in self.__dict__:
+            return self.__dict__["common_locations"]
+        if top_k not in self._similarity:
+            self._similarity[top_k] = ut.common_elements(self.ifloc, self.nb_orders, self.nb_locations, top_k=top_k)
+        return self._similarity[top_k]
+
+    @cached_property
+    def pickers_bounds(self):
+        return ut.max_pickers_bounds(self.orders, self.nb_orders, self.max_nb_orders, self.max_vol, self.vol)
+
+    @property
+    def min_pickers(self) -> int:
+        return self.pickers_bounds[0]
+
+    @property
+    def max_pickers(self) -> int:
+        return self.pickers_bounds[1]
+
+    def __getitem__(self, key: str):
+        if key in self._extra:
+            return self._extra[key]
+        if key in self.KEYS:
+            return getattr(self, key)
+        if key == "locations_pickers" and "batches" in self._extra:
+            # locations of each picker, derived from the batches on first access
+            self._extra[key] = ut.get_picker_locations_from_ifloc(self._extra["batches"], self.ifloc, self.nb_locations)
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value):
+        if key in self.KEYS:
+            raise KeyError(f"{key} is derived from the instance and cannot be set")
+        if key == "batches":
+            # picker locations of the previous batches are stale
+            self._extra.pop("locations_pickers", None)
+        self._extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._extra or key in self.KEYS or (key == "locations_pickers" and "batches" in self._extra)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self.KEYS) + list(self._extra)
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bump when the content of a compiled instance changes, so that older caches are rebuilt
+FORMAT_VERSION = 3
+
+# arrays stored in a compiled instance, one .npy file each
+ARRAYS = ("adj_matrix", "order_ids", "order_ptr", "order_locs", "vol", "constraints", "pair_rows", "pair_cols", "pair_counts", "pair_offset")
+
+def source_hash(*paths: str | Path) -> str:
+    """
+    Content hash (sha256) of the source files of an instance, plus FORMAT_VERSION.
+    Files are read by blocks so that large matrices are never fully in memory.
+    """
+    digest = hashlib.sha256(f"format-{FORMAT_VERSION}".encode())
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def compiled_path(cache_dir: str | Path, key: str) -> Path:
+    """Directory holding the compiled instance of a given key."""
+    return Path(cache_dir) / f"instance-{key}"
+
+def save_compiled(cache_dir: str | Path, key: str, arrays: Dict[str, np.ndarray]) -> Path:
+    """
+    Write a compiled instance as a directory of .npy files plus a meta.json.
+    The directory is written next to its final place and renamed, so a crashed
+    run never leaves a half-written cache behind.
+
+    Args:
+        cache_dir (str | Path): cache directory
+        key (str): source_hash of the source files
+        arrays (Dict[str, np.ndarray]): one entry per name of ARRAYS
+
+    Returns:
+        Path: directory of the compiled instance
+    """
+    target = compiled_path(cache_dir, key)
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+
+    tmp = Path(tempfile.mkdtemp(prefix=".instance-", dir=cache_dir))
+    try:
+        for name in ARRAYS:
+            np.save(tmp / f"{name}.npy", np.ascontiguousarray(arrays[name]))
+        with (tmp / "meta.json").open("w", encoding="utf-8") as f:
+            json.dump({"key": key, "format": FORMAT_VERSION}, f)
+        if target.exists():
+            shutil.rmtree(target)
+        os.replace(tmp, target)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    logger.info("Compiled instance written to %s", target)
+    return target
+
+def load_compiled(cache_dir: str | Path, key: str) -> Dict[str, Any] | None:
+    """
+    Load a compiled instance, or None if it is missing or invalid (it is then rebuilt by the caller).
+    The distance matrix is memory-mapped, the other arrays are read in memory.
+    """
+    path = compiled_path(cache_dir, key)
+    try:
+        with (path / "meta.json").open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("key") != key or meta.get("format") != FORMAT_VERSION:
+            logger.warning("Compiled instance %s does not match its sources, rebuilding", path)
+            return None
+
+        arrays = {"adj_matrix": np.load(path / "adj_matrix.npy", mmap_mode="r")}
+        for name in ARRAYS[1:]:
+            arrays[name] = np.load(path / f"{name}.npy")
+    except (OSError, ValueError) as e:
+        if path.exists():
+            logger.warning("Compiled instance %s is unreadable (%s), rebuilding", path, e)
+        return None
+
+    logger.info("Compiled instance loaded from %s", path)
+    return arrays
@@ -0,0 +1,153 @@
+import argparse
+from pathlib import Path
+from typing import List, Dict, Any
+
+import numpy as np
+
+def aisle_layout(nb_locations: int, nb_aisles: int | None = None, aisle_width: int = 3, slot_length: int = 1):
+    """
+    Coordinates of a rectangular warehouse with parallel aisles and a cross aisle at both ends.
+
+    Location 0 (departure) and location nb_locations - 1 (arrival) are at the front, at the
+    left and right ends of the front cross aisle. The storage locations in between are spread
+    over nb_aisles aisles (about sqrt(storage / 2) if None), slots on both sides of an aisle
+    share a position.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, int]: aisle of each location (x, in units of aisle_width),
+            depth in the aisle (y, 0 at the front cross aisle), and the aisle length
+    """
+    nb_storage = nb_locations - 2
+    if nb_aisles is None:
+        nb_aisles = max(1, int(round(np.sqrt(nb_storage / 2))))
+    per_aisle = int(np.ceil(nb_storage / nb_aisles))
+    # two slots (one per side) per position
+    aisle_length = (per_aisle + 1) // 2 * slot_length + 1
+
+    k = np.arange(nb_storage)
+    aisle = k // per_aisle
+    depth = 1 + (k % per_aisle) // 2 * slot_length
+
+    x = np.concatenate(([0], aisle, [nb_aisles - 1])) * aisle_width
+    y = np.concatenate(([0], depth, [0]))
+    return x, y, aisle_length
+
+def aisle_distances(x: np.ndarray, y: np.ndarray, aisle_length: int) -> np.ndarray:
+    """
+    Shortest distances in the aisle layout: along the aisle within an aisle, otherwise through
+    the front or the back cross aisle, whichever is shorter.
+    """
+    same_aisle = x[:, None] == x[None, :]
+    within = np.abs(y[:, None] - y[None, :])
+    through = np.minimum(y[:, None] + y[None, :], 2 * aisle_length - y[:, None] - y[None, :]) + np.abs(x[:, None] - x[None, :])
+    return np.where(same_aisle, within, through).astype(np.int64)
+
+def generate_instance(nb_locations: int, nb_orders: int, seed: int = 0, nb_aisles: int | None = None,
+                      mean_lines: float = 3.0, max_lines: int = 10, popularity_skew: float = 1.0,
+                      mean_volume: float = 20.0, volume_sigma: float = 0.6,
+                      max_nb_orders: int = 8, max_vol: int | None = None) -> Dict[str, Any]:
+    """
+    Seeded synthetic warehouse instance.
+
+    - Layout: rectangular aisles (aisle_layout), distances of aisle_distances.
+    - Orders: 1 + Poisson(mean_lines - 1) lines (at most max_lines), on storage locations drawn
+      without replacement with a Zipf-like popularity (weight 1 / rank^popularity_skew, over a
+      random ranking of the locations); every order also visits 0 and nb_locations - 1, as in
+      the toy data.
+    - Volumes: log-normal around mean_volume (sigma volume_sigma), clipped to [1, max_vol].
+    - Constraints: max_nb_orders, and max_vol (if None, the volume of max_nb_orders average orders).
+
+    Returns:
+        Dict: adj_matrix (np.ndarray), orders (list of (volume, sorted locations)) and constraints (max_nb_orders, max_vol)
+    """
+    if nb_locations < 3:
+        raise ValueError(f"At least 3 locations are needed, got {nb_locations}")
+
+    rng = np.random.default_rng(seed)
+
+    x, y, aisle_length = aisle_layout(nb_locations, nb_aisles)
+    adj_matrix = aisle_distances(x, y, aisle_length)
+
+    storage = np.arange(1, nb_locations - 1)
+    weights = 1.0 / np.arange(1, len(storage) + 1) ** popularity_skew
+    weights = weights[rng.permutation(len(storage))]
+    weights /= weights.sum()
+
+    if max_vol is None:
+        max_vol = int(np.ceil(max_nb_orders * mean_volume))
+
+    nb_lines = np.minimum(1 + rng.poisson(max(mean_lines - 1, 0), nb_orders), min(max_lines, len(storage)))
+    # an order heavier than max_vol could not be picked at all
+    volumes = np.clip(np.rint(rng.lognormal(np.log(mean_volume), volume_sigma, nb_orders)), 1, max_vol).astype(np.int64)
+
+    orders = []
+    for o in range(nb_orders):
+        lines = rng.choice(storage, size=nb_lines[o], replace=False, p=weights)
+        orders.append((int(volumes[o]), [0] + sorted(lines.tolist()) + [nb_locations - 1]))
+
+    return {"adj_matrix": adj_matrix, "orders": orders, "constraints": (max_nb_orders, max_vol)}
+
+def check_instance(instance: Dict[str, Any]):
+    """
+    Raise a ValueError if the instance has no feasible batching: an order heavier than
+    max_vol, or a non-positive max_nb_orders.
+    """
+    max_nb_orders, max_vol = instance["constraints"]
+    if max_nb_orders < 1:
+        raise ValueError(f"max_nb_orders must be positive, got {max_nb_orders}")
+    heavy = [o for o, (volume, _) in enumerate(instance["orders"]) if volume > max_vol]
+    if heavy:
+        raise ValueError(f"{len(heavy)} orders are heavier than max_vol ({max_vol}), e.g. order {heavy[0]}")
+
+def write_instance(directory: str | Path, instance: Dict[str, Any]) -> Dict[str, Path]:
+    """
+    Write an instance in the formats of data_loader (matrix.txt, orders.txt, constraints.txt),
+    after checking that it is feasible (check_instance).
+
+    Returns:
+        Dict[str, Path]: path of each file
+    """
+    check_instance(instance)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = {name: directory / f"{name}.txt" for name in ("matrix", "orders", "constraints")}
+
+    adj_matrix = instance["adj_matrix"]
+    with paths["matrix"].open("w", encoding="utf-8") as f:
+        f.write(f"{len(adj_matrix)}\n")
+        np.savetxt(f, adj_matrix, fmt="%d")
+
+    orders: List = instance["orders"]
+    with paths["orders"].open("w", encoding="utf-8") as f:
+        f.write(f"{len(orders)}\n")
+        for o, (volume, locations) in enumerate(orders):
+            f.write(f"{o} {volume} {len(locations)}\n")
+            f.write(" ".join(map(str, locations)) + "\n")
+
+    max_nb_orders, max_vol = instance["constraints"]
+    with paths["constraints"].open("w", encoding="utf-8") as f:
+        f.write(f"{max_nb_orders} {max_vol}\n")
+
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic warehouse instance")
+    parser.add_argument("directory")
+    parser.add_argument("--locations", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--aisles", type=int, default=None)
+    parser.add_argument("--mean-lines", type=float, default=3.0)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--mean-volume", type=float, default=20.0)
+    parser.add_argument("--max-nb-orders", type=int, default=8)
+    parser.add_argument("--max-vol", type=int, default=None)
+    args = parser.parse_args()
+
+    instance = generate_instance(args.locations, args.orders, seed=args.seed, nb_aisles=args.aisles,
+                                 mean_lines=args.mean_lines, popularity_skew=args.skew, mean_volume=args.mean_volume,
+                                 max_nb_orders=args.max_nb_orders, max_vol=args.max_vol)
+    write_instance(args.directory, instance)
+
+if __name__ == "__main__":
+    main()
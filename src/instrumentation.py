@@ -0,0 +1,166 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Callable, List, Dict, Any, Iterator
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# comma separated stage names to profile with cProfile ("all" for every stage), see enable_profiling
+PROFILE_ENV = "WAREHOUSE_PROFILE"
+
+def peak_rss_mb() -> float | None:
+    """Peak resident memory of the process in MB, None where the resource module is missing."""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class RunReport:
+    """
+    Machine-readable report of a run: one entry per stage (wall / CPU time, peak RSS and any
+    field added by the stage, e.g. the size and solve statistics of a model).
+    """
+
+    def __init__(self):
+        self.stages: List[Dict[str, Any]] = []
+        self.started = time.time()
+
+    def add(self, entry: Dict[str, Any]):
+        self.stages.append(entry)
+
+    def find(self, name: str) -> List[Dict[str, Any]]:
+        """Entries of the stages called name (last part of the nested name)."""
+        return [entry for entry in self.stages if entry["stage"].rsplit("/", 1)[-1] == name]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"started": self.started, "elapsed": time.time() - self.started, "peak_rss_mb": peak_rss_mb(), "stages": self.stages}
+
+    def write(self, path: str | Path) -> Path:
+        """Write the report as JSON."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        logger.info("Run report written to %s", path)
+        return path
+
+_report = RunReport()
+_stack: List[str] = []
+_profiled: set = {name for name in os.environ.get(PROFILE_ENV, "").split(",") if name}
+_profile_dir: Path | None = None
+
+def get_report() -> RunReport:
+    return _report
+
+def reset_report() -> RunReport:
+    """Start a new report (e.g. between two runs in the same process)."""
+    global _report
+    _report = RunReport()
+    return _report
+
+def enable_profiling(stages: List[str] | str = "all", directory: str | Path | None = None):
+    """
+    Profile the given stages with cProfile (also set by the WAREHOUSE_PROFILE environment
+    variable). The 20 most expensive functions are logged at DEBUG level, and the raw stats
+    are written to directory/<stage>.prof if a directory is given.
+    """
+    global _profile_dir
+    _profiled.update([stages] if isinstance(stages, str) else stages)
+    _profile_dir = Path(directory) if directory is not None else None
+
+@contextmanager
+def stage(name: str, **info) -> Iterator[Dict[str, Any]]:
+    """
+    Time a stage of the pipeline: wall and CPU time are logged at INFO level and added to the
+    run report with info and the fields the caller sets on the yielded entry. Nested stages
+    are named parent/child.
+
+        with instrumentation.stage("common_elements") as entry:
+            ...
+            entry["pairs"] = len(pairs)
+    """
+    _stack.append(name)
+    full_name = "/".join(_stack)
+    entry: Dict[str, Any] = {"stage": full_name, **info}
+
+    profiler = None
+    if "all" in _profiled or name in _profiled:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield entry
+    finally:
+        entry["wall"] = time.perf_counter() - wall
+        entry["cpu"] = time.process_time() - cpu
+        entry["peak_rss_mb"] = peak_rss_mb()
+        _stack.pop()
+
+        if profiler is not None:
+            profiler.disable()
+            if _profile_dir is not None:
+                _profile_dir.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(_profile_dir / f"{full_name.replace('/', '.')}.prof")
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(20)
+            logger.debug("Profile of %s:\n%s", full_name, stream.getvalue())
+
+        _report.add(entry)
+        extra = {k: v for k, v in entry.items() if k not in ("stage", "wall", "cpu", "peak_rss_mb")}
+        logger.info("Stage %s: %.3fs wall, %.3fs cpu%s", full_name, entry["wall"], entry["cpu"], f" {extra}" if extra else "")
+
+def timed(name: str | None = None) -> Callable:
+    """Decorator running a function as a stage (named after the function if name is None)."""
+    def decorator(function: Callable) -> Callable:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name or function.__name__):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def model_size(model) -> Dict[str, int]:
+    """Number of variables, constraints and non-zero coefficients of a PuLP model."""
+    return {
+        "variables": len(model.variables()),
+        "constraints": len(model.constraints),
+        "nonzeros": sum(len(constraint) for constraint in model.constraints.values()),
+    }
+
+def parse_cbc_log(text: str) -> Dict[str, Any]:
+    """
+    Result of a CBC run read from its log: status line, incumbent objective and best bound (as
+    printed by CBC, i.e. in the sense of the problem it solved) and relative gap (0 when the
+    search completed, CBC's own value when it stopped early).
+    """
+    result: Dict[str, Any] = {"result": None, "incumbent": None, "bound": None, "gap": None}
+    match = re.search(r"^Result - (.+)$", text, re.MULTILINE)
+    if match:
+        result["result"] = match.group(1).strip()
+    for key, label in (("incumbent", "Objective value"), ("bound", "(?:Lower|Upper) bound"), ("gap", "Gap")):
+        match = re.search(rf"^{label}:\s+(\S+)", text, re.MULTILINE)
+        if match:
+            try:
+                result[key] = float(match.group(1))
+            except ValueError:
+                pass
+    if result["gap"] is not None:
+        # CBC prints a negative gap on maximization problems
+        result["gap"] = abs(result["gap"])
+    if result["gap"] is None and result["result"] and result["result"].startswith("Optimal"):
+        result["gap"] = 0.0
+    return result
@@ -0,0 +1,197 @@
+import logging
+import random
+import time
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+import heuristics as hr
+import solver_models as sm
+
+logger = logging.getLogger(__name__)
+
+# fast repairs in a row after which lns_batching destroys one more batch
+GROW_AFTER = 10
+
+# CBC options of the sub-models: a single round of root cuts and no strong branching, the
+# root of these small, weakly bounded models otherwise takes the whole sub_time_limit
+SUB_SOLVER_OPTIONS = ["passCuts 1", "strongBranching 0"]
+
+def related_by_shared_locations(data, batches: Dict[int, List[int]], batch_of: Dict[int, int], seed_picker: int, universal: np.ndarray) -> List[int]:
+    """
+    Pickers sorted by decreasing number of locations their orders share with the orders of
+    seed_picker (read from the inverted index of ifloc), locations visited by every order ignored.
+    """
+    score: Dict[int, int] = {}
+    for o in batches[seed_picker]:
+        neighbours, counts = data["ifloc"].neighbours(o, exclude=universal)
+        for o2, count in zip(neighbours.tolist(), counts.tolist()):
+            p = batch_of[o2]
+            if p != seed_picker:
+                score[p] = score.get(p, 0) + count
+    return sorted(score, key=lambda p: -score[p])
+
+def related_by_distance(data, batches: Dict[int, List[int]], seed_picker: int, universal: np.ndarray) -> List[int]:
+    """
+    Pickers sorted by increasing average distance (adj_matrix) from their locations to the
+    closest location of seed_picker, locations visited by every order ignored.
+    """
+    ifloc = data["ifloc"]
+    adj_matrix = data["adj_matrix"]
+
+    def own_locations(orders: List[int]) -> np.ndarray:
+        locs = np.unique(np.concatenate([ifloc.locations_of(o) for o in orders]))
+        return locs[~np.isin(locs, universal)]
+
+    seed_locs = own_locations(batches[seed_picker])
+    if not len(seed_locs):
+        return []
+    # distance from the seed batch to every location (only the seed rows of the matrix are read)
+    to_seed = np.asarray(adj_matrix[seed_locs, :]).min(axis=0)
+
+    score = {}
+    for p, orders in batches.items():
+        if p == seed_picker or not orders:
+            continue
+        locs = own_locations(orders)
+        score[p] = float(to_seed[locs].mean()) if len(locs) else float("inf")
+    return sorted(score, key=lambda p: score[p])
+
+def solve_sub_batching(data, sub_batches: List[List[int]], time_limit: float, max_nodes: int | None = None,
+                       gap: float | None = None) -> List[List[int]] | None:
+    """
+    Re-optimize the orders of a few batches with the model of model_batching restricted to them
+    (compact formulation, one picker per destroyed batch). The current batches are passed to CBC
+    as a MIP start, so the sub-model always has an incumbent to improve. CBC stops at time_limit,
+    max_nodes branch-and-bound nodes or a relative gap of gap, whichever comes first.
+
+    Returns:
+        List[List[int]] | None: the new batches, or None if no complete solution was found
+    """
+    a = data["common_locations"]
+    sub_batches = [batch for batch in sub_batches if batch]
+    orders = sorted(o for batch in sub_batches for o in batch)
+    nb_pickers = len(sub_batches)
+
+    model, y, z, s = sm.build_batching_model(orders, nb_pickers, data["vol"], a, data["max_nb_orders"], data["max_vol"],
+                                          name="lns_batching", compact=True)
+
+    sm.set_batching_start(y, z, dict(enumerate(sub_batches)), s)
+    sm.solve_model(model, sm.make_solver(time_limit=time_limit, gap=gap, msg=False, warm_start=True, max_nodes=max_nodes,
+                                         extra_options=SUB_SOLVER_OPTIONS), name=None)
+
+    new_batches = [[] for _ in range(nb_pickers)]
+    for (p, o), var in y.items():
+        if (var.varValue or 0) > 0.5:
+            new_batches[p].append(o)
+    if sum(len(batch) for batch in new_batches) != len(orders):
+        return None
+    return new_batches
+
+def lns_batching(data, batches: Dict[int, List[int]] | None = None, time_limit: float = 10.0, nb_destroy: int = 3,
+                 relatedness: str = "shared", sub_time_limit: float = 1.0, sub_max_nodes: int | None = 100,
+                 sub_gap: float | None = None, seed: int = 0) -> Tuple[Dict[int, List[int]], List[Tuple[float, int]]]:
+    """
+    Large-neighbourhood search for the batching problem.
+
+    Keeps a global batch assignment (from greedy_batching if none is given) and repeatedly:
+        1. destroys a few related batches: a random batch and the batches sharing the
+           most locations with it ("shared") or closest to it in adj_matrix ("distance"),
+        2. re-optimizes their orders with a small model built like model_batching
+           (sm.build_batching_model, compact formulation), solved by CBC under sub_time_limit
+           and sub_max_nodes with the current batches as MIP start,
+        3. keeps the new batches if they do not decrease the objective.
+
+    The number of destroyed batches starts at nb_destroy and adapts to the solve time: it
+    decreases (down to 2) when a repair reaches sub_time_limit, and increases back (up to
+    nb_destroy) after GROW_AFTER repairs in a row taking less than a quarter of it. Repairs
+    that end without a complete solution are not counted as tried neighbourhoods.
+
+    Args:
+        data (Dict): instance data built by main.load_data
+        batches (Dict | None): starting solution {picker: list of orders}
+        time_limit (float): overall time budget in seconds
+        nb_destroy (int): maximum number of batches destroyed per iteration
+        relatedness (str): "shared" or "distance"
+        sub_time_limit (float): time limit of each sub-model in seconds
+        sub_max_nodes (int | None): branch-and-bound node limit of each sub-model
+        sub_gap (float | None): relative gap at which each sub-model stops
+        seed (int): seed of the random generator
+
+    Returns:
+        tuple[Dict, List[tuple[float, int]]]: best batches, and the incumbent log
+            [(elapsed seconds, objective)] with one entry per improvement
+    """
+    if relatedness not in ("shared", "distance"):
+        raise ValueError(f"Unknown relatedness: {relatedness}")
+
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    a = data["common_locations"]
+    universal = data["ifloc"].universal_locations()
+
+    if batches is None:
+        batches = hr.greedy_batching(data)
+    batches = {p: list(orders) for p, orders in batches.items()}
+    batch_of = {o: p for p, orders in batches.items() for o in orders}
+
+    objective = hr.batching_objective(batches, a)
+    history = [(0.0, objective)]
+    logger.info("LNS start: objective %s", objective)
+
+    nb_destroyed, nb_fast = nb_destroy, 0
+    tried = failed = 0
+    while time.perf_counter() - start < time_limit:
+        used = [p for p, orders in batches.items() if orders]
+        if len(used) < 2:
+            break
+
+        # destroy: a random batch and its most related batches
+        seed_picker = rng.choice(used)
+        if relatedness == "shared":
+            related = related_by_shared_locations(data, batches, batch_of, seed_picker, universal)
+        else:
+            related = related_by_distance(data, batches, seed_picker, universal)
+        destroyed = [seed_picker] + related[:nb_destroyed - 1]
+        while len(destroyed) < min(nb_destroyed, len(used)):
+            p = rng.choice(used)
+            if p not in destroyed:
+                destroyed.append(p)
+
+        current = hr.batching_objective({p: batches[p] for p in destroyed}, a)
+
+        # repair: small MIP on the destroyed orders
+        remaining = time_limit - (time.perf_counter() - start)
+        sub_limit = max(0.1, min(sub_time_limit, remaining))
+        repair_start = time.perf_counter()
+        sub_batches = solve_sub_batching(data, [batches[p] for p in destroyed], sub_limit, max_nodes=sub_max_nodes, gap=sub_gap)
+        repair_time = time.perf_counter() - repair_start
+        if repair_time >= sub_limit:
+            nb_destroyed, nb_fast = max(min(2, nb_destroy), nb_destroyed - 1), 0
+        elif repair_time < sub_limit / 4:
+            nb_fast += 1
+            if nb_fast == GROW_AFTER:
+                nb_destroyed, nb_fast = min(nb_destroy, nb_destroyed + 1), 0
+        else:
+            nb_fast = 0
+        if sub_batches is None:
+            failed += 1
+            continue
+        tried += 1
+        new = hr.batching_objective(dict(enumerate(sub_batches)), a)
+        if new < current:
+            continue
+
+        for p, sub_batch in zip(destroyed, sub_batches):
+            batches[p] = sub_batch
+            for o in sub_batch:
+                batch_of[o] = p
+
+        if new > current:
+            objective += new - current
+            elapsed = time.perf_counter() - start
+            history.append((elapsed, objective))
+            logger.info("LNS repair %s (%.2fs, %s batches): objective %s", tried, elapsed, len(destroyed), objective)
+
+    logger.info("LNS end: objective %s, %s repairs tried, %s without solution", objective, tried, failed)
+    return {p: sorted(orders) for p, orders in batches.items()}, history
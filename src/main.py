@@ -4,8 +4,17 @@ import numpy as np
 from typing import Dict, Any, Tuple
 
 import data_loader as dl
+import instance as ins
+import instance_cache as ca
+import instrumentation as instr
 import utils as ut
 import solver_models as sm
+import heuristics as hr
+import routing as rt
+import lns
+import colgen as cg
+import online as ol
+import decomposition as dc
 import checker.instance_checker as ic
 import checker.solution_checker as sc
 
@@ -24,63 +33,91 @@ logger = logging.getLogger(__name__)
 # Data Loading
 # -----------------------------------------------------------------------------
 
-def load_data(adj_matrix_path: str, orders_path: str, constraints_path: str) -> Dict[str, Any]:
+@instr.timed()
+def load_data(adj_matrix_path: str, orders_path: str, constraints_path: str, cache_dir: str | None = None, validate: bool = True) -> ins.Instance:
     """
     Load data.
+
+    Returns an instance.Instance, usable as the data dictionary of the models. Only the input
+    files are parsed here: derived data (ifloc, common_locations, picker bounds, picker
+    locations) is computed on first access, so routing-only or validation-only runs never
+    pay for the O(n^2) preprocessing.
+
+    If cache_dir is given, the parsed and preprocessed instance (distance matrix, orders,
+    constraints, shared locations) is compiled once into cache_dir, keyed by the content hash
+    of the three files. Later loads of the same files read the compiled instance instead of
+    parsing and validating the text files again; a changed source file gets a new key.
+
+    Args:
+        adj_matrix_path, orders_path, constraints_path (str): input files
+        cache_dir (str | None): directory of the compiled instances
+        validate (bool): run the instance checkers on the parsed files
     """
 
     logger.info("Loading Data...")
-    
-    adj_matrix = dl.load_matrix(adj_matrix_path)
-    check_mat = ic.check_distance_matrix(adj_matrix)
-    logger.debug("Check matrix %s: %s", adj_matrix_path, check_mat)
-    if not check_mat[0]:
-        logger.critical("Distance matrix %s is INVALID. Errors: %s", adj_matrix_path, check_mat[1])
-
-    orders = dl.load_orders(orders_path)
-    check_orders = ic.check_orders(orders)
-    logger.debug("Check orders %s: %s", orders_path, check_orders)
-    if not check_orders[0]:
-        logger.critical("Orders %s are INVALID. Errors: %s", orders_path, check_orders[1])
 
-    constraints = dl.load_constraints(constraints_path)
-    check_constraints = ic.check_constraints(constraints)
-    logger.debug("Check constraints %s: %s", constraints_path, check_constraints)
-    if not check_constraints[0]:
-        logger.critical("Constraints %s are INVALID. Erros: %s", constraints_path, check_constraints[1])
+    key = None
+    if cache_dir is not None:
+        key = ca.source_hash(adj_matrix_path, orders_path, constraints_path)
+        with instr.stage("load_compiled"):
+            arrays = ca.load_compiled(cache_dir, key)
+        if arrays is not None:
+            orders = ins.OrderSet(arrays["order_ids"], arrays["vol"], arrays["order_ptr"], arrays["order_locs"])
+            max_nb_orders, max_vol = arrays["constraints"].tolist()
+            data = ins.Instance(arrays["adj_matrix"], orders, max_nb_orders, max_vol)
+            data.ifloc = ut.LocOrderIncidence(data.nb_locations, arrays["order_ptr"], arrays["order_locs"])
+            data.common_locations = ut.pairs_to_common(arrays["pair_rows"], arrays["pair_cols"], arrays["pair_counts"], data.nb_orders,
+                                                       int(arrays["pair_offset"][0]))
+            return data
+
+    with instr.stage("load_matrix"):
+        adj_matrix = dl.load_matrix(adj_matrix_path)
+    if validate:
+        with instr.stage("check_matrix"):
+            check_mat = ic.check_distance_matrix(adj_matrix)
+        logger.debug("Check matrix %s: %s", adj_matrix_path, check_mat)
+        if not check_mat[0]:
+            logger.critical("Distance matrix %s is INVALID. Errors: %s", adj_matrix_path, check_mat[1])
+
+    with instr.stage("load_orders"):
+        orders = ins.OrderSet.from_compact(dl.load_orders_compact(orders_path))
+    if validate:
+        with instr.stage("check_orders"):
+            check_orders = ic.check_orders(orders, nb_locations=len(adj_matrix))
+        logger.debug("Check orders %s: %s", orders_path, check_orders)
+        if not check_orders[0]:
+            logger.critical("Orders %s are INVALID. Errors: %s", orders_path, check_orders[1])
 
-    # nb of locations and nb of orders
-    nb_locations, nb_orders = ut.get_locations_and_orders_counts(adj_matrix, orders)
+    constraints = dl.load_constraints(constraints_path)
+    if validate:
+        check_constraints = ic.check_constraints(constraints)
+        logger.debug("Check constraints %s: %s", constraints_path, check_constraints)
+        if not check_constraints[0]:
+            logger.critical("Constraints %s are INVALID. Erros: %s", constraints_path, check_constraints[1])
 
     # max for the number of orders in a batch and for the volume in a batch
     max_nb_orders, max_vol = constraints
 
-    # volume of the orders
-    vol = [orders[number]["volume"] for number in range(nb_orders)]
-
-    # lower and upper bound for the number of pickers
-    lower_bound, upper_bound = ut.max_pickers_bounds(orders, nb_orders, max_nb_orders, max_vol, vol)
-    min_pickers = lower_bound
-    max_pickers = upper_bound
-
-    # binary data which takes 1 if the location is part of the order and 0 otherwise
-    ifloc = ut.if_loc_in_order(nb_locations, orders)
-
-    # Vector containing the number of locations shared by each pair of orders
-    common_locations = ut.common_elements(ifloc, nb_orders, nb_locations)
-
-    data = {
-        "adj_matrix": adj_matrix,
-        "ifloc": ifloc,
-        "vol": vol,
-        "nb_locations": nb_locations,
-        "nb_orders": nb_orders,
-        "min_pickers": min_pickers,
-        "max_pickers": max_pickers,
-        "max_nb_orders": max_nb_orders,
-        "max_vol": max_vol,
-        "common_locations": common_locations
-    }
+    data = ins.Instance(adj_matrix, orders, max_nb_orders, max_vol)
+
+    if cache_dir is not None:
+        # compilation: the preprocessing is done once and stored
+        pair_rows, pair_cols, pair_counts, pair_offset = ut.residual_shared_locations(data.ifloc)
+        data.common_locations = ut.pairs_to_common(pair_rows, pair_cols, pair_counts, data.nb_orders, pair_offset)
+        with instr.stage("save_compiled"):
+            ca.save_compiled(cache_dir, key, {
+                "adj_matrix": adj_matrix,
+                "order_ids": orders.ids,
+                "order_ptr": data.ifloc.order_ptr,
+                "order_locs": data.ifloc.order_locs,
+                "vol": orders.volumes,
+                "constraints": np.asarray(constraints, dtype=np.int64),
+                "pair_rows": pair_rows,
+                "pair_cols": pair_cols,
+                "pair_counts": pair_counts,
+                "pair_offset": np.asarray([pair_offset], dtype=np.int64),
+            })
+
     return data
 
 def add_data(data, batches, locations_pickers):
@@ -92,6 +129,10 @@ def test_picking(data):
     travel = sm.model_picking(data)
     return travel
 
+def test_heuristic_picking(data):
+    travel = rt.heuristic_picking(data)
+    return travel
+
 def test_batching(data):
     batches = sm.model_batching(data)
     # checker
@@ -101,6 +142,70 @@ def test_batching(data):
     locations_pickers = ut.get_picker_locations_from_ifloc(batches, data["ifloc"], data["nb_locations"])
     return batches, locations_pickers
 
+def test_greedy_batching(data):
+    batches = hr.greedy_batching(data)
+    check_batching = sc.check_batching_solution(batches, data["vol"], data["max_nb_orders"], data["max_vol"])
+    print(check_batching)
+    locations_pickers = ut.get_picker_locations_from_ifloc(batches, data["ifloc"], data["nb_locations"])
+    return batches, locations_pickers
+
+def test_route_length_batching(data):
+    estimator = rt.RouteLengthEstimator(data["adj_matrix"], data["ifloc"])
+    batches = hr.route_length_batching(data, estimator=estimator)
+    print("Estimated total length:", estimator.total(batches))
+    check_batching = sc.check_batching_solution(batches, data["vol"], data["max_nb_orders"], data["max_vol"])
+    print(check_batching)
+    locations_pickers = ut.get_picker_locations_from_ifloc(batches, data["ifloc"], data["nb_locations"])
+    return batches, locations_pickers
+
+def test_colgen_batching(data, time_limit=60.0):
+    batches, stats = cg.colgen_batching(data, time_limit=time_limit)
+    print(stats)
+    check_batching = sc.check_batching_solution(batches, data["vol"], data["max_nb_orders"], data["max_vol"])
+    print(check_batching)
+    locations_pickers = ut.get_picker_locations_from_ifloc(batches, data["ifloc"], data["nb_locations"])
+    return batches, locations_pickers
+
+def test_local_search(data, batches, time_limit=1.0):
+    batches = hr.local_search_batching(data, batches, time_limit=time_limit)
+    check_batching = sc.check_batching_solution(batches, data["vol"], data["max_nb_orders"], data["max_vol"])
+    print(check_batching)
+    locations_pickers = ut.get_picker_locations_from_ifloc(batches, data["ifloc"], data["nb_locations"])
+    return batches, locations_pickers
+
+def test_lns(data, time_limit=10.0):
+    batches, history = lns.lns_batching(data, time_limit=time_limit)
+    print(history)
+    check_batching = sc.check_batching_solution(batches, data["vol"], data["max_nb_orders"], data["max_vol"])
+    print(check_batching)
+    locations_pickers = ut.get_picker_locations_from_ifloc(batches, data["ifloc"], data["nb_locations"])
+    return batches, locations_pickers
+
+def test_online_batching(data, release_every=10):
+    # orders arrive one by one, full batches are released every release_every orders
+    batcher = ol.OnlineBatcher(data["adj_matrix"], data["max_nb_orders"], data["max_vol"])
+    released = {}
+    for o in range(data["nb_orders"]):
+        batcher.add_order(data["vol"][o], data["ifloc"].locations_of(o), order_id=o)
+        if (o + 1) % release_every == 0:
+            batcher.improve()
+            released.update(batcher.release())
+    released.update(batcher.flush())
+    print(batcher.stats())
+    batches = hr.pad_batches(list(released.values()), data["max_pickers"])
+    check_batching = sc.check_batching_solution(batches, data["vol"], data["max_nb_orders"], data["max_vol"])
+    print(check_batching)
+    locations_pickers = ut.get_picker_locations_from_ifloc(batches, data["ifloc"], data["nb_locations"])
+    return batches, locations_pickers
+
+def test_decomposed_batching(data, clustering="affinity", batching="greedy", max_cluster_size=200):
+    batches, stats = dc.decomposed_batching(data, clustering=clustering, batching=batching, max_cluster_size=max_cluster_size)
+    print(stats)
+    check_batching = sc.check_batching_solution(batches, data["vol"], data["max_nb_orders"], data["max_vol"])
+    print(check_batching)
+    locations_pickers = ut.get_picker_locations_from_ifloc(batches, data["ifloc"], data["nb_locations"])
+    return batches, locations_pickers
+
 def main():
     BASE_DIR = os.path.dirname(__file__)
     matrix_path = os.path.join(BASE_DIR, "toy_data", "matrix.txt")
@@ -110,7 +215,15 @@ def main():
     data = load_data(matrix_path, orders_path, constraints_path)
     tests = {
         "picking": test_picking,
-        "batching" : test_batching
+        "heuristic_picking": test_heuristic_picking,
+        "batching" : test_batching,
+        "greedy_batching": test_greedy_batching,
+        "route_length_batching": test_route_length_batching,
+        "colgen_batching": test_colgen_batching,
+        "local_search": test_local_search,
+        "lns": test_lns,
+        "online_batching": test_online_batching,
+        "decomposed_batching": test_decomposed_batching
     }
     # batches, locations_pickers = tests["batching"](data)
     # print(batches, locations_pickers)
@@ -121,5 +234,10 @@ def main():
     # check_picking = sc.check_picking_solution(travel, data["nb_locations"])
     # print(check_picking)
 
+    # machine-readable report of the stages (timings, model sizes, solver statistics)
+    report_path = os.environ.get("WAREHOUSE_REPORT")
+    if report_path:
+        instr.get_report().write(report_path)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,275 @@
+import logging
+import time
+from typing import Iterable, List, Dict, Tuple
+
+import numpy as np
+
+import heuristics as hr
+import utils as ut
+
+logger = logging.getLogger(__name__)
+
+class OnlineBatcher:
+    """
+    Incremental batching of orders arriving during a shift.
+
+    Orders are added one at a time (add_order) and inserted, like in greedy_batching, into the
+    open batch they share the most locations with, as long as max_nb_orders and max_vol are
+    respected; an order that overlaps no open batch it fits in goes to the fullest open batch
+    it fits in, and only opens a new batch if it fits in none. Batches handed to the pickers
+    are released (release / flush) and never change afterwards.
+
+    Only the open orders are kept, so the cost of an update and the memory depend on the
+    number of open orders and their overlaps, not on the number of orders seen since the
+    start of the shift (a released order leaves every structure):
+        - orders: id, volume and locations of the open orders
+        - incidence: inverted index location -> open orders
+        - similarity: shared locations of every overlapping pair of open orders
+        - bounds: histogram {volume: open orders}, updated with each order, from which the
+          picker bounds of the open orders (utils.max_pickers_bounds) are computed on demand
+
+    The ignored locations (by default the departure and arrival points, visited by every
+    order) are not counted in the overlaps, as the universal locations of greedy_batching.
+    """
+
+    def __init__(self, adj_matrix, max_nb_orders: int, max_vol: int, ignore: Iterable[int] | None = None):
+        self.nb_locations = len(adj_matrix)
+        self.max_nb_orders = max_nb_orders
+        self.max_vol = max_vol
+        if ignore is None:
+            ignore = (0, self.nb_locations - 1)
+        self.ignore = np.unique(np.asarray(list(ignore), dtype=np.int64))
+
+        # open orders, by internal number (order of arrival)
+        self.ids: Dict[int, int] = {}
+        self.vol: Dict[int, int] = {}
+        self.locations: Dict[int, np.ndarray] = {}
+        self._nb_orders = 0
+        self.min_vol: int | None = None
+
+        # number of open orders of each volume
+        self.volumes: Dict[int, int] = {}
+
+        # open orders: inverted index and shared locations {o: {o2: count}}
+        self.orders_at: List[set] = [set() for _ in range(self.nb_locations)]
+        self.shared: Dict[int, Dict[int, int]] = {}
+
+        # batches: open ones can still receive orders, released ones are frozen
+        self.batches: Dict[int, List[int]] = {}
+        self.load: Dict[int, int] = {}
+        self.nb_released = 0
+        self.batch_of: Dict[int, int] = {}
+        self._next_batch = 0
+        self._bounds: Tuple[int, int] | None = None
+
+        self.nb_updates = 0
+        self.update_time = 0.0
+        self.max_update_time = 0.0
+
+    @property
+    def nb_orders(self) -> int:
+        """Number of orders seen since the start of the shift."""
+        return self._nb_orders
+
+    @property
+    def open_orders(self) -> List[int]:
+        return sorted(self.shared)
+
+    def add_order(self, volume: int, locations: Iterable[int], order_id: int | None = None) -> int:
+        """
+        Add an arrived order and insert it into a batch.
+
+        Args:
+            volume (int): volume of the order
+            locations (Iterable[int]): locations visited by the order
+            order_id (int | None): id of the order in the caller's data (its number if None)
+
+        Returns:
+            int: batch the order was put in
+        """
+        start = time.perf_counter()
+        if volume > self.max_vol:
+            raise ValueError(f"Order {order_id} has a volume of {volume}, more than max_vol ({self.max_vol})")
+
+        o = self._nb_orders
+        locs = np.unique(np.asarray(list(locations), dtype=np.int64))
+        if len(locs) and (locs[0] < 0 or locs[-1] >= self.nb_locations):
+            raise ValueError(f"Order {order_id} visits a location outside 0..{self.nb_locations - 1}")
+        volume = int(volume)
+        self._nb_orders += 1
+        self.ids[o] = o if order_id is None else order_id
+        self.vol[o] = volume
+        self.locations[o] = locs
+        self.min_vol = volume if self.min_vol is None else min(self.min_vol, volume)
+        self.volumes[volume] = self.volumes.get(volume, 0) + 1
+
+        # similarity with the open orders, through the inverted index
+        counts: Dict[int, int] = {}
+        for loc in locs[~np.isin(locs, self.ignore)].tolist():
+            for o2 in self.orders_at[loc]:
+                counts[o2] = counts.get(o2, 0) + 1
+            self.orders_at[loc].add(o)
+        self.shared[o] = counts
+        for o2, count in counts.items():
+            self.shared[o2][o] = count
+
+        # best open batch: largest overlap among the batches the order fits in
+        gain: Dict[int, int] = {}
+        for o2, count in counts.items():
+            p = self.batch_of[o2]
+            gain[p] = gain.get(p, 0) + count
+        best, best_gain = None, 0
+        for p, g in gain.items():
+            if (g > best_gain or (g == best_gain and best is not None and p < best)) and self._fits(p, volume):
+                best, best_gain = p, g
+
+        # no overlap: the fullest open batch the order fits in, so that batches fill up
+        if best is None:
+            fitting = [p for p in self.batches if self._fits(p, volume)]
+            if fitting:
+                best = max(fitting, key=lambda p: (self.load[p], len(self.batches[p]), -p))
+
+        if best is None:
+            best = self._next_batch
+            self._next_batch += 1
+            self.batches[best] = []
+            self.load[best] = 0
+        self.batches[best].append(o)
+        self.load[best] += volume
+        self.batch_of[o] = best
+        self._bounds = None
+
+        elapsed = time.perf_counter() - start
+        self.nb_updates += 1
+        self.update_time += elapsed
+        self.max_update_time = max(self.max_update_time, elapsed)
+        return best
+
+    def add_orders(self, orders: Iterable[Tuple[int, Iterable[int]]]) -> List[int]:
+        """Add several orders given as (volume, locations), see add_order."""
+        return [self.add_order(volume, locations) for volume, locations in orders]
+
+    def _fits(self, p: int, volume: int) -> bool:
+        return len(self.batches[p]) < self.max_nb_orders and self.load[p] + volume <= self.max_vol
+
+    def is_full(self, p: int) -> bool:
+        """An open batch is full when it has max_nb_orders orders or no order seen so far would fit in it."""
+        return len(self.batches[p]) >= self.max_nb_orders or self.load[p] + self.min_vol > self.max_vol
+
+    @property
+    def pickers_bounds(self) -> Tuple[int, int]:
+        """
+        Lower and upper bounds on the number of pickers needed by the open orders, from the
+        histogram of their volumes (in the number of distinct volumes, not of open orders).
+        """
+        if self._bounds is None:
+            if self.volumes:
+                self._bounds = ut.max_pickers_bounds(None, len(self.vol), self.max_nb_orders, self.max_vol,
+                                                     list(self.volumes), list(self.volumes.values()))
+            else:
+                self._bounds = (0, 0)
+        return self._bounds
+
+    def release(self, batches: Iterable[int] | None = None) -> Dict[int, List[int]]:
+        """
+        Freeze batches and hand them to the pickers: their orders leave the index and can no
+        longer be moved.
+
+        Args:
+            batches (Iterable[int] | None): open batches to release (the full ones if None)
+
+        Returns:
+            Dict[int, List[int]]: {batch: orders} released, orders given by their id
+        """
+        if batches is None:
+            batches = [p for p in self.batches if self.is_full(p)]
+        released = {}
+        for p in list(batches):
+            orders = self.batches.pop(p)
+            del self.load[p]
+            released[p] = sorted(self.ids[o] for o in orders)
+            for o in orders:
+                for loc in self.locations.pop(o).tolist():
+                    self.orders_at[loc].discard(o)
+                for o2 in self.shared.pop(o):
+                    if o2 in self.shared:
+                        del self.shared[o2][o]
+                volume = self.vol.pop(o)
+                self.volumes[volume] -= 1
+                if not self.volumes[volume]:
+                    del self.volumes[volume]
+                del self.ids[o]
+                del self.batch_of[o]
+            self.nb_released += 1
+        if released:
+            self._bounds = None
+            logger.debug("Released batches %s", list(released))
+        return released
+
+    def flush(self) -> Dict[int, List[int]]:
+        """Release every open batch (e.g. at the end of the shift)."""
+        return self.release(list(self.batches))
+
+    def objective(self) -> int:
+        """Shared (non-ignored) locations of the pairs of orders in the same open batch."""
+        return sum(self.shared[o].get(o2, 0) for orders in self.batches.values()
+                   for i, o in enumerate(orders) for o2 in orders[i + 1:])
+
+    def improve(self, time_limit: float = 0.05, seed: int = 0) -> int:
+        """
+        Re-optimize the open batches with heuristics.local_search_batching (released batches
+        are not touched). The open orders are renumbered into a small instance for the search.
+
+        Returns:
+            int: objective of the open batches after the search
+        """
+        orders = self.open_orders
+        if len(self.batches) < 2:
+            return self.objective()
+        local = {o: k for k, o in enumerate(orders)}
+
+        rows, cols, counts = [], [], []
+        for o in orders:
+            for o2, count in self.shared[o].items():
+                if o < o2:
+                    rows.append(local[o])
+                    cols.append(local[o2])
+                    counts.append(count)
+        offsets = np.zeros(len(orders) + 1, dtype=np.int64)
+        np.cumsum([len(self.locations[o]) for o in orders], out=offsets[1:])
+        flat = np.concatenate([self.locations[o] for o in orders]) if orders else np.zeros(0, dtype=np.int64)
+        ifloc = ut.LocOrderIncidence.from_compact(self.nb_locations, offsets, flat).without_locations(self.ignore)
+        data = {
+            "common_locations": ut.pairs_to_common(np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64),
+                                                   np.asarray(counts, dtype=np.int64), len(orders)),
+            "vol": [self.vol[o] for o in orders],
+            "ifloc": ifloc,
+            "max_nb_orders": self.max_nb_orders,
+            "max_vol": self.max_vol,
+        }
+
+        pickers = list(self.batches)
+        start = {k: [local[o] for o in self.batches[p]] for k, p in enumerate(pickers)}
+        improved = hr.local_search_batching(data, start, time_limit=time_limit, seed=seed)
+        for k, p in enumerate(pickers):
+            self.batches[p] = [orders[o] for o in improved[k]]
+            self.load[p] = sum(self.vol[o] for o in self.batches[p])
+            for o in self.batches[p]:
+                self.batch_of[o] = p
+        # a batch emptied by the search is closed
+        for p in [p for p in pickers if not self.batches[p]]:
+            del self.batches[p]
+            del self.load[p]
+        return self.objective()
+
+    def stats(self) -> Dict[str, float]:
+        """Number of orders and batches, and latency of the updates in milliseconds."""
+        return {
+            "orders": self.nb_orders,
+            "open_orders": len(self.shared),
+            "open_batches": len(self.batches),
+            "released_batches": self.nb_released,
+            "updates": self.nb_updates,
+            "mean_update_ms": 1000 * self.update_time / self.nb_updates if self.nb_updates else 0.0,
+            "max_update_ms": 1000 * self.max_update_time,
+        }
@@ -0,0 +1,375 @@
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Iterable, List, Dict, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def sub_matrix(locations: List[int], adj_matrix: np.ndarray) -> List[List[float]]:
+    """
+    Distances between the given locations only: sub[a][b] = adj_matrix[locations[a], locations[b]].
+    Only this small block is copied out of the (possibly memory-mapped) matrix.
+    """
+    return adj_matrix[np.ix_(locations, locations)].tolist()
+
+def path_length(path: List[int], dist: List[List[float]]) -> float:
+    """Length of a path given as indices of dist."""
+    return sum(dist[path[k]][path[k + 1]] for k in range(len(path) - 1))
+
+def nearest_neighbour_path(dist: List[List[float]], start: int, end: int) -> List[int]:
+    """
+    Open path from start to end over every index of dist, always going to the closest unvisited index.
+    """
+    n = len(dist)
+    unvisited = set(range(n)) - {start, end}
+    path = [start]
+    current = start
+    while unvisited:
+        current = min(unvisited, key=lambda j: dist[current][j])
+        unvisited.remove(current)
+        path.append(current)
+    if end != start:
+        path.append(end)
+    return path
+
+def cheapest_insertion_path(dist: List[List[float]], start: int, end: int) -> List[int]:
+    """
+    Open path from start to end over every index of dist, built by inserting at each step
+    the index whose cheapest insertion is the smallest.
+    """
+    n = len(dist)
+    path = [start, end] if end != start else [start]
+    unvisited = set(range(n)) - {start, end}
+    while unvisited:
+        best = None
+        for j in unvisited:
+            for k in range(len(path) - 1):
+                a, b = path[k], path[k + 1]
+                cost = dist[a][j] + dist[j][b] - dist[a][b]
+                if best is None or cost < best[0]:
+                    best = (cost, j, k + 1)
+        if best is None:
+            # single point path: append the remaining indices
+            best = (0, min(unvisited), len(path))
+        _, j, position = best
+        path.insert(position, j)
+        unvisited.remove(j)
+    return path
+
+def two_opt(path: List[int], dist: List[List[float]]) -> List[int]:
+    """
+    2-opt on an open path with fixed endpoints: reverse path[i..j] while it shortens the path.
+    Works on asymmetric distances: prefix sums of the forward and backward arc costs give the
+    cost of a reversed segment in O(1).
+    """
+    n = len(path)
+    improved = True
+    while improved:
+        improved = False
+        forward = [0.0] * n
+        backward = [0.0] * n
+        for k in range(n - 1):
+            forward[k + 1] = forward[k] + dist[path[k]][path[k + 1]]
+            backward[k + 1] = backward[k] + dist[path[k + 1]][path[k]]
+
+        for i in range(1, n - 2):
+            for j in range(i + 1, n - 1):
+                old = dist[path[i - 1]][path[i]] + forward[j] - forward[i] + dist[path[j]][path[j + 1]]
+                new = dist[path[i - 1]][path[j]] + backward[j] - backward[i] + dist[path[i]][path[j + 1]]
+                if new < old - 1e-9:
+                    path[i:j + 1] = path[i:j + 1][::-1]
+                    improved = True
+                    break
+            if improved:
+                break
+    return path
+
+def or_opt(path: List[int], dist: List[List[float]], max_segment: int = 3) -> List[int]:
+    """
+    Or-opt on an open path with fixed endpoints: move segments of 1..max_segment consecutive
+    locations to another position of the path while it shortens the path.
+    """
+    improved = True
+    while improved:
+        improved = False
+        n = len(path)
+        for length in range(1, max_segment + 1):
+            for i in range(1, n - length):
+                j = i + length - 1
+                prev, nxt = path[i - 1], path[j + 1]
+                first, last = path[i], path[j]
+                removal_gain = dist[prev][first] + dist[last][nxt] - dist[prev][nxt]
+                for k in range(n - 1):
+                    if i - 1 <= k <= j:
+                        continue
+                    a, b = path[k], path[k + 1]
+                    insertion_cost = dist[a][first] + dist[last][b] - dist[a][b]
+                    if insertion_cost < removal_gain - 1e-9:
+                        segment = path[i:j + 1]
+                        rest = path[:i] + path[j + 1:]
+                        position = k + 1 if k < i else k + 1 - length
+                        path[:] = rest[:position] + segment + rest[position:]
+                        improved = True
+                        break
+                if improved:
+                    break
+            if improved:
+                break
+    return path
+
+def route_picker(locations: List[int], adj_matrix, construction: str = "nearest_neighbour", improve: bool = True) -> List[int]:
+    """
+    Heuristic open path of one picker, from location 0 to its arrival location (the last of
+    the sorted locations, as in model_picking), visiting every location of its batch.
+
+    Args:
+        locations (List[int]): sorted locations of the picker (locations_pickers[p])
+        adj_matrix (np.ndarray): distance matrix
+        construction (str): "nearest_neighbour" or "cheapest_insertion"
+        improve (bool): apply 2-opt and Or-opt to the constructed path
+
+    Returns:
+        List[int]: locations in visiting order
+    """
+    if not locations:
+        return []
+
+    dist = sub_matrix(locations, adj_matrix)
+    start = locations.index(0) if 0 in locations else 0
+    end = len(locations) - 1
+
+    if construction == "nearest_neighbour":
+        path = nearest_neighbour_path(dist, start, end)
+    elif construction == "cheapest_insertion":
+        path = cheapest_insertion_path(dist, start, end)
+    else:
+        raise ValueError(f"Unknown construction heuristic: {construction}")
+
+    if improve and len(path) > 3:
+        path = two_opt(path, dist)
+        path = or_opt(path, dist)
+        path = two_opt(path, dist)
+
+    return [locations[k] for k in path]
+
+def path_to_arcs(path: List[int]) -> List[Tuple[int, int]]:
+    """Arcs (i, j) of a path, as in the travel output of model_picking."""
+    return [(path[k], path[k + 1]) for k in range(len(path) - 1)]
+
+def heuristic_picking(data, construction: str = "nearest_neighbour", improve: bool = True):
+    """
+    Fast alternative to model_picking: route every picker independently with a
+    construction heuristic followed by 2-opt / Or-opt.
+
+    Returns:
+        tuple[Dict, Dict]: (travel, u_values) with the shape of model_picking:
+            travel[p] is the list of arcs of picker p, u_values[p] the position of each
+            location of locations_pickers[p] in the path (arrival at nb_locations - 1)
+    """
+    adj_matrix = data["adj_matrix"]
+    nb_locations = data["nb_locations"]
+    locations_pickers = data["locations_pickers"]
+
+    travel: Dict[int, List[Tuple[int, int]]] = {}
+    u_values: Dict[int, List[float]] = {}
+    for p, locations in locations_pickers.items():
+        path = route_picker(locations, adj_matrix, construction, improve)
+        travel[p] = path_to_arcs(path)
+        if locations:
+            position = {loc: float(k) for k, loc in enumerate(path)}
+            position[path[-1]] = float(nb_locations - 1)
+            u_values[p] = [position[i] for i in locations]
+
+    return travel, u_values
+
+def batch_locations(orders: List[int], ifloc) -> List[int]:
+    """
+    Sorted locations visited by a batch of orders, as in get_picker_locations_from_ifloc.
+    """
+    if not orders:
+        return []
+    return np.unique(np.concatenate([ifloc.locations_of(o) for o in orders])).tolist()
+
+def layout_key(adj_matrix) -> str:
+    """
+    Content hash (sha256) of a distance matrix, identifying the warehouse layout of a
+    persisted RouteCostCache. The matrix is read by blocks of rows (it may be memory-mapped).
+    """
+    digest = hashlib.sha256(str(adj_matrix.shape).encode())
+    for start in range(0, len(adj_matrix), 1024):
+        digest.update(np.ascontiguousarray(adj_matrix[start:start + 1024], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+class RouteCostCache:
+    """
+    Bounded cache of route costs keyed by location set, with least-recently-used eviction.
+
+    A location set is canonicalized as the sorted tuple of its locations, so the lists of
+    get_picker_locations_from_ifloc, sets or arrays of the same locations share one entry.
+    Hits, misses and evictions are counted. With a path, the cache is read from and written
+    to a .npz file, and entries are only reused for the same layout (see layout_key).
+
+    Args:
+        maxsize (int): maximum number of entries, the least recently used are evicted
+        path (str | Path | None): .npz file persisting the cache between runs
+        layout (str | None): layout_key of the distance matrix the costs were computed on
+    """
+
+    def __init__(self, maxsize: int = 100_000, path: str | Path | None = None, layout: str | None = None):
+        if maxsize <= 0:
+            raise ValueError(f"maxsize must be positive, got {maxsize}")
+        self.maxsize = maxsize
+        self.path = Path(path) if path is not None else None
+        self.layout = layout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._costs: OrderedDict[Tuple[int, ...], float] = OrderedDict()
+        if self.path is not None and self.path.exists():
+            self.load()
+
+    @staticmethod
+    def key(locations: Iterable[int]) -> Tuple[int, ...]:
+        """Canonical key of a location set."""
+        return tuple(sorted(int(loc) for loc in locations))
+
+    def get(self, locations: Iterable[int]) -> float | None:
+        """Cached cost of a location set, or None (counted as a miss)."""
+        key = self.key(locations)
+        cost = self._costs.get(key)
+        if cost is None:
+            self.misses += 1
+            return None
+        self._costs.move_to_end(key)
+        self.hits += 1
+        return cost
+
+    def put(self, locations: Iterable[int], cost: float):
+        key = self.key(locations)
+        self._costs[key] = float(cost)
+        self._costs.move_to_end(key)
+        while len(self._costs) > self.maxsize:
+            self._costs.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(self, locations: Iterable[int], compute: Callable[[List[int]], float]) -> float:
+        """
+        Cached cost of a location set, computed by compute(sorted locations) on a miss.
+        Any routing engine (route_picker, an exact model, ...) can be plugged in as compute.
+        """
+        key = self.key(locations)
+        cost = self._costs.get(key)
+        if cost is not None:
+            self._costs.move_to_end(key)
+            self.hits += 1
+            return cost
+        self.misses += 1
+        cost = float(compute(list(key)))
+        self.put(key, cost)
+        return cost
+
+    def __len__(self) -> int:
+        return len(self._costs)
+
+    def __contains__(self, locations) -> bool:
+        return self.key(locations) in self._costs
+
+    def clear(self):
+        self._costs.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """Counters of the cache."""
+        return {"size": len(self), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hit_rate}
+
+    def save(self, path: str | Path | None = None) -> Path:
+        """
+        Write the entries (least recently used first) to a .npz file: flat locations with
+        offsets, as in instance.OrderSet, plus the costs and the layout key.
+        """
+        path = Path(path) if path is not None else self.path
+        if path is None:
+            raise ValueError("No path given to save the route cost cache")
+        keys = list(self._costs)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(key) for key in keys], out=offsets[1:])
+        locations = np.fromiter((loc for key in keys for loc in key), dtype=np.int64, count=int(offsets[-1]))
+        costs = np.fromiter(self._costs.values(), dtype=np.float64, count=len(keys))
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, offsets=offsets, locations=locations, costs=costs, layout=np.array(self.layout or ""))
+        os.replace(tmp, path)
+        logger.info("Route cost cache (%s entries) written to %s", len(keys), path)
+        return path
+
+    def load(self, path: str | Path | None = None):
+        """Add the entries of a .npz file written by save, if it was computed on the same layout."""
+        path = Path(path) if path is not None else self.path
+        try:
+            with np.load(path) as f:
+                layout = str(f["layout"])
+                offsets, locations, costs = f["offsets"], f["locations"], f["costs"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Route cost cache %s is unreadable (%s), starting empty", path, e)
+            return
+        if layout != (self.layout or ""):
+            logger.warning("Route cost cache %s was computed on another layout, starting empty", path)
+            return
+        locations = locations.tolist()
+        for k, cost in enumerate(costs.tolist()):
+            self.put(tuple(locations[offsets[k]:offsets[k + 1]]), cost)
+        logger.info("Route cost cache (%s entries) loaded from %s", len(costs), path)
+
+class RouteLengthEstimator:
+    """
+    Estimated route length of a batch: length of the heuristic path of route_picker over its
+    locations. Costs are kept in a RouteCostCache, so batches visiting the same locations are
+    routed once.
+
+    Args:
+        adj_matrix (np.ndarray): distance matrix
+        ifloc (LocOrderIncidence): locations of each order
+        construction (str): construction heuristic of route_picker
+        improve (bool): apply 2-opt / Or-opt (slower, closer to model_picking)
+        cache (RouteCostCache | None): cache of the costs, a new one if None
+    """
+
+    def __init__(self, adj_matrix, ifloc, construction: str = "nearest_neighbour", improve: bool = False,
+                 cache: RouteCostCache | None = None):
+        self.adj_matrix = adj_matrix
+        self.ifloc = ifloc
+        self.construction = construction
+        self.improve = improve
+        self.cache = cache if cache is not None else RouteCostCache()
+
+    def route_length(self, locations: List[int]) -> float:
+        """Length of the route_picker path over sorted locations (not cached)."""
+        path = route_picker(locations, self.adj_matrix, self.construction, self.improve)
+        return float(sum(self.adj_matrix[i, j] for i, j in path_to_arcs(path)))
+
+    def cost(self, locations: List[int]) -> float:
+        """Route length of a list of locations (a value of locations_pickers)."""
+        return self.cache.get_or_compute(locations, self.route_length)
+
+    def batch_cost(self, orders: List[int]) -> float:
+        """Route length of the batch holding the given orders."""
+        return self.cost(batch_locations(orders, self.ifloc))
+
+    def picker_costs(self, locations_pickers: Dict[int, List[int]]) -> Dict[int, float]:
+        """Route length of every picker of get_picker_locations_from_ifloc."""
+        return {p: self.cost(locations) if locations else 0.0 for p, locations in locations_pickers.items()}
+
+    def total(self, batches: Dict[int, List[int]]) -> float:
+        """Estimated total distance of a batching solution."""
+        return sum(self.batch_cost(orders) for orders in batches.values() if orders)
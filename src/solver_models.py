@@ -1,7 +1,185 @@
+import logging
+import os
+import tempfile
+import time
+import numpy as np
 import pulp as pl
-from typing import List, Dict, Set
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Set, Tuple
+
+import bulk_model as bm
+import instrumentation as instr
+import utils as ut
+
+logger = logging.getLogger(__name__)
+
+def make_solver(backend: str = "PULP_CBC_CMD", time_limit: float | None = None, gap: float | None = None,
+                threads: int | None = None, msg: bool = True, warm_start: bool = False, max_nodes: int | None = None,
+                extra_options: List[str] | None = None):
+    """
+    PuLP solver for the models of this module.
+
+    Args:
+        backend (str): name of a PuLP solver (pl.listSolvers(onlyAvailable=True)), CBC by default
+        time_limit (float | None): time limit in seconds
+        gap (float | None): relative MIP gap at which the solver stops
+        threads (int | None): number of solver threads
+        msg (bool): print the solver log
+        warm_start (bool): pass the initial values of the variables as a MIP start
+        max_nodes (int | None): number of branch-and-bound nodes at which the solver stops
+        extra_options (List[str] | None): extra command-line options of the solver (e.g. CBC's "passCuts 1")
+
+    Returns:
+        pl.LpSolver: the configured solver
+    """
+    options = {"msg": msg}
+    if time_limit is not None:
+        options["timeLimit"] = time_limit
+    if gap is not None:
+        options["gapRel"] = gap
+    if threads is not None:
+        options["threads"] = threads
+    if warm_start:
+        options["warmStart"] = True
+    if max_nodes is not None:
+        options["maxNodes"] = max_nodes
+    if extra_options:
+        options["options"] = list(extra_options)
+    return pl.getSolver(backend, **options)
+
+def solve_model(model: pl.LpProblem, solver=None, name: str | None = "solve", **info) -> int:
+    """
+    Solve a model, with PuLP's default solver (CBC) if solver is None.
+
+    Unless name is None, the solve is recorded as an instrumentation stage with info (e.g. the
+    build time of the model), the model size, status, objective, and CBC's incumbent / bound / gap
+    read from its log (the log is still printed when the solver has msg on).
+
+    CBC compares a MIP start with the wrong sign on maximization problems (-max) and drops it:
+    with a warm-started CBC, a maximization is solved as the minimization of the opposite
+    objective, then the model is restored.
+    """
+    if solver is None:
+        solver = make_solver()
+
+    if name is None:
+        return _solve(model, solver)
+
+    with instr.stage(name, model=model.name, **info, **instr.model_size(model)) as entry:
+        if isinstance(solver, pl.PULP_CBC_CMD) and not solver.optionsDict.get("logPath"):
+            # capture the log of CBC to read its gap
+            msg = solver.msg
+            with tempfile.TemporaryDirectory() as directory:
+                log_path = os.path.join(directory, "cbc.log")
+                solver.msg = False
+                solver.optionsDict["logPath"] = log_path
+                try:
+                    status = _solve(model, solver)
+                finally:
+                    solver.msg = msg
+                    del solver.optionsDict["logPath"]
+                with open(log_path, encoding="utf-8", errors="replace") as f:
+                    log = f.read()
+            if msg:
+                print(log, end="")
+            entry.update(instr.parse_cbc_log(log))
+        else:
+            status = _solve(model, solver)
+        entry["status"] = pl.LpStatus[status]
+        entry["objective"] = pl.value(model.objective)
+    return status
+
+def _solve(model: pl.LpProblem, solver) -> int:
+    flip = (model.sense == pl.LpMaximize and isinstance(solver, pl.PULP_CBC_CMD)
+            and solver.optionsDict.get("warmStart"))
+    if not flip:
+        return model.solve(solver)
+
+    objective = model.objective
+    model.sense = pl.LpMinimize
+    model.setObjective(-objective)
+    try:
+        return model.solve(solver)
+    finally:
+        model.sense = pl.LpMaximize
+        model.setObjective(objective)
+
+def set_batching_start(y, z, batches: Dict[int, List[int]], s=None) -> bool:
+    """
+    Initial values of the variables of build_batching_model from a batching solution
+    (greedy_batching, a previous run, ...). Batches are numbered by their smallest order, as
+    required by the compact formulation, and every order must be in one batch.
+
+    Returns:
+        bool: False (and no initial value set) if the solution does not fit the model
+    """
+    ordered = sorted((sorted(orders) for orders in batches.values() if orders), key=lambda orders: orders[0])
+    picker_of = {o: p for p, orders in enumerate(ordered) for o in orders}
+    orders = {o for (_, o) in y}
+    if set(picker_of) != orders or any((picker_of[o], o) not in y for o in orders):
+        logger.warning("Initial batches do not fit the batching model, solving without MIP start")
+        return False
+
+    for (p, o), var in y.items():
+        var.setInitialValue(1 if picker_of[o] == p else 0)
+    for (p, o, o2), var in z.items():
+        var.setInitialValue(1 if picker_of[o] == p and picker_of[o2] == p else 0)
+    for (p, k), var in (s or {}).items():
+        var.setInitialValue(1 if p < len(ordered) and len(ordered[p]) == k else 0)
+    return True
+
+def set_routing_start(x, u, locations: List[int], arcs: List[Tuple[int, int]], nb_locations: int, p: int | None = None) -> bool:
+    """
+    Initial values of the routing variables of one picker from its path (the travel arcs of
+    heuristic_picking or of a previous run): x on the arcs, u the position in the path (the
+    arrival at nb_locations - 1). x and u are keyed by (i, j, p) / (i, p), or (i, j) / i when p is None.
+
+    Returns:
+        bool: False (and no initial value set) if the arcs are not a path over locations
+    """
+    successor = dict(arcs)
+    path = [0] if 0 in locations else []
+    while path and path[-1] in successor and len(path) <= len(locations):
+        path.append(successor[path[-1]])
+    if sorted(path) != sorted(locations) or path[-1] != locations[-1]:
+        logger.warning("Initial route of picker %s is not a path over its locations, ignored", p)
+        return False
+
+    key_x = (lambda i, j: (i, j, p)) if p is not None else (lambda i, j: (i, j))
+    key_u = (lambda i: (i, p)) if p is not None else (lambda i: i)
+    position = {loc: k for k, loc in enumerate(path)}
+    position[path[-1]] = nb_locations - 1
+    for i in locations:
+        u[key_u(i)].setInitialValue(position[i])
+        for j in locations:
+            if i != j:
+                x[key_x(i, j)].setInitialValue(1 if successor.get(i) == j else 0)
+    return True
+
+def model_batching(data, compact: bool = False, initial_batches: Dict[int, List[int]] | None = None, solver=None,
+                   builder: str = "pulp") -> Dict:
+    """
+    Batching model: assign orders to pickers maximizing the number of shared locations.
+
+    Args:
+        data (Dict): instance data built by main.load_data
+        compact (bool): use the symmetry-reduced formulation (see model_batching_compact)
+        initial_batches (Dict | None): batching solution (e.g. greedy_batching) passed as MIP start
+        solver (pl.LpSolver | None): solver (see make_solver), PuLP's default if None;
+            a CBC solver with warmStart is used when initial_batches is given without solver
+        builder (str): "pulp" (PuLP expressions) or "bulk" (NumPy arrays written directly as MPS
+            for CBC, see model_batching_bulk), much faster to build on large instances
+
+    Returns:
+        Dict[int, List[int]]: {picker: list of assigned orders} for every picker in range(max_pickers)
+    """
+    if builder == "bulk":
+        return model_batching_bulk(data, compact=compact, initial_batches=initial_batches, solver=solver)
+    if builder != "pulp":
+        raise ValueError(f"Unknown model builder: {builder}")
+    if compact:
+        return model_batching_compact(data, initial_batches=initial_batches, solver=solver)
 
-def model_batching(data) -> Dict:
     vol = data["vol"]
 
     nb_orders = data["nb_orders"]
@@ -12,61 +190,207 @@ def model_batching(data) -> Dict:
 
     a = data["common_locations"]
 
+    build_start = time.perf_counter()
+    model, y, z, _ = build_batching_model(list(range(nb_orders)), max_pickers, vol, a, max_nb_orders, max_vol)
+
+    if initial_batches is not None and set_batching_start(y, z, initial_batches) and solver is None:
+        solver = make_solver(warm_start=True)
+
+    status = solve_model(model, solver, name="model_batching", build_time=time.perf_counter() - build_start)
+    print("Solver status:", pl.LpStatus[status])
+
+    solution = {}
+    for p in range(max_pickers):
+        for o in range(nb_orders):
+            solution[p,o] = y[p,o].varValue or 0
+
+    batches = {
+        p : [o for o in range(nb_orders) if (solution[p,o] or 0) > 0.5]
+        for p in range(max_pickers)
+    }
+
+    return batches
+
+def build_batching_model(orders: List[int], nb_pickers: int, vol, a, max_nb_orders: int, max_vol: int, name: str = "model_batching",
+                         compact: bool = False, min_pickers: int = 0):
+    """
+    Build the batching model of model_batching over a subset of the orders.
+
+    With compact=True the symmetry-reduced formulation is built instead (see model_batching_compact):
+    the i-th order can only be done by a picker p <= i, picker p is used only if picker p-1 is,
+    the first min_pickers pickers are used, and z only exists for pairs sharing locations other
+    than the universal ones (a.offset, see utils.SharedLocations), which are counted through the
+    batch sizes s.
+
+    Args:
+        orders (List[int]): sorted order numbers to batch (range(nb_orders) for the full model)
+        nb_pickers (int): number of pickers available for these orders
+        vol: volume of each order
+        a: shared locations a[o, o2] with o < o2 (common_locations)
+        max_nb_orders (int): maximum orders a picker can handle
+        max_vol (int): maximum volume a picker can carry
+        name (str): name of the PuLP problem
+        compact (bool): build the symmetry-reduced formulation
+        min_pickers (int): number of pickers that must be used (compact formulation only)
+
+    Returns:
+        tuple[pl.LpProblem, Dict, Dict, Dict]: the model, its assignment variables y[p, o], product
+            variables z[p, o, o2] and batch size indicators s[p, k] (empty unless compact with an offset)
+    """
     # maximization problem creation
-    model = pl.LpProblem("model_batching", pl.LpMaximize)
+    model = pl.LpProblem(name, pl.LpMaximize)
+
+    # pickers allowed for each order, orders allowed for each picker
+    if compact:
+        pickers_of = {o: range(min(i + 1, nb_pickers)) for i, o in enumerate(orders)}
+    else:
+        pickers_of = {o: range(nb_pickers) for o in orders}
+    orders_of = {p: [o for o in orders if p in pickers_of[o]] for p in range(nb_pickers)}
+
+    # locations shared by every pair: counted by the batch sizes in the compact formulation
+    offset = getattr(a, "offset", 0) if compact else 0
+
+    # pairs of orders (o < o2), only those sharing other locations in the compact formulation,
+    # with their shared locations not counted by the offset
+    pairs = [(o, o2) for i, o in enumerate(orders) for o2 in orders[i + 1:] if not compact or a.get((o, o2), 0) > offset]
+    shared = {(o, o2): a[o, o2] - offset for (o, o2) in pairs}
 
     ## Variables
 
     # decison variable that is equal to 1 if the picker p handles the order o
-    y = pl.LpVariable.dicts("y", [(p,o) for p in range(max_pickers) for o in range(nb_orders)], cat="Binary")
+    y = pl.LpVariable.dicts("y", [(p,o) for o in orders for p in pickers_of[o]], cat="Binary")
 
-    # Decision variable equal to the product of y_po and y_po'
-    z = pl.LpVariable.dicts("z", [(p,o,o2) for p in range(max_pickers) for o in range(nb_orders) for o2 in range(nb_orders) if o<o2], cat="Binary")
+    # Decision variable equal to the product of y_po and y_po' (o < o2, hence pickers_of[o] is the smallest range)
+    z = pl.LpVariable.dicts("z", [(p,o,o2) for (o,o2) in pairs for p in pickers_of[o]], cat="Binary")
+
+    # s[p, k] = 1 if picker p handles k orders (k >= 2, at most one k per picker)
+    sizes = {p: range(2, min(max_nb_orders, len(orders_of[p])) + 1) for p in range(nb_pickers)} if offset else {}
+    s = pl.LpVariable.dicts("s", [(p,k) for p in sizes for k in sizes[p]], cat="Binary")
 
     ## Objective function
-    model += sum(z[p,o,o2] * a[o,o2] for p in range(max_pickers) for o in range(nb_orders) for o2 in range(nb_orders) if o<o2)
+    # every pair of orders of a batch of k orders shares the offset locations: k * (k - 1) / 2 pairs
+    model += (pl.lpSum(z[p,o,o2] * shared[o,o2] for (o,o2) in pairs for p in pickers_of[o])
+              + pl.lpSum(s[p,k] * (offset * k * (k - 1) // 2) for (p,k) in s))
 
     ## Constraints
 
-    # a minimum of nb_orders must be done
-    model += sum(y[p,o] for p in range(max_pickers) for o in range(nb_orders)) >= nb_orders
+    # a minimum of nb_orders must be done (implied by the next constraints, kept in the original formulation)
+    if not compact:
+        model += pl.lpSum(y[p,o] for o in orders for p in pickers_of[o]) >= len(orders)
 
     # An order can only be done once
-    for o in range(nb_orders):
-        model += sum(y[p,o] for p in range(max_pickers)) == 1
+    for o in orders:
+        model += pl.lpSum(y[p,o] for p in pickers_of[o]) == 1
 
     # A picker can't do more than max_nb_ord
-    for p in range(max_pickers):
-        model += sum(y[p,o] for o in range(nb_orders)) <= max_nb_orders
+    for p in range(nb_pickers):
+        model += pl.lpSum(y[p,o] for o in orders_of[p]) <= max_nb_orders
 
     # A picker can't carry more than max_vol
-    for p in range(max_pickers):
-        model += sum(y[p,o] * vol[o] for o in range(nb_orders)) <= max_vol
+    for p in range(nb_pickers):
+        model += pl.lpSum(y[p,o] * vol[o] for o in orders_of[p]) <= max_vol
+
+    if compact:
+        # Symmetry breaking: the first min_pickers pickers are used, then picker p only if picker p-1 is
+        for p in range(min(min_pickers, nb_pickers)):
+            model += pl.lpSum(y[p,o] for o in orders_of[p]) >= 1
+        for p in range(max(1, min_pickers), nb_pickers):
+            model += pl.lpSum(y[p,o] for o in orders_of[p]) <= max_nb_orders * pl.lpSum(y[p-1,o] for o in orders_of[p-1])
 
     # z[p, o, o2] is the product between y[p, o] and y[p, o2]
-    for p in range(max_pickers):
-        for o in range(nb_orders):
-            for o2 in range(o+1, nb_orders):
-                model += z[p,o,o2] <= y[p,o]
-                model += z[p,o,o2] <= y[p,o2]
+    # (maximized with positive coefficients, the upper bounds are enough in the compact formulation)
+    for (o, o2) in pairs:
+        for p in pickers_of[o]:
+            model += z[p,o,o2] <= y[p,o]
+            model += z[p,o,o2] <= y[p,o2]
+            if not compact:
                 model += z[p,o,o2] >= y[p,o] + y[p,o2] - 1
-    
-    status = model.solve()
-    print("Solver status:", pl.LpStatus[status])
 
-    solution = {}
-    for p in range(max_pickers):
-        for o in range(nb_orders):
-            solution[p,o] = y[p,o].varValue or 0
+    # s[p, k] selects at most the size of batch p (maximized with increasing coefficients)
+    for p in sizes:
+        if sizes[p]:
+            model += pl.lpSum(s[p,k] for k in sizes[p]) <= 1
+            model += pl.lpSum(k * s[p,k] for k in sizes[p]) <= pl.lpSum(y[p,o] for o in orders_of[p])
+
+    return model, y, z, s
+
+def model_batching_compact(data, initial_batches: Dict[int, List[int]] | None = None, solver=None, builder: str = "pulp") -> Dict:
+    """
+    Symmetry-reduced, compact formulation of model_batching.
+
+    - Pickers are bounded by [min_pickers, ut.max_pickers_merge_bound] instead of [0, max_pickers].
+    - Batches are ordered by their smallest order: order o can only be done by a picker p <= o,
+      picker p is used only if picker p-1 is used, and the first min_pickers pickers are used.
+    - z[p, o, o2] is only created for pairs sharing locations other than the universal ones
+      (departure and arrival, visited by every order), with the residual count as coefficient.
+      Since the objective is maximized with positive coefficients, z <= y[p, o] and z <= y[p, o2]
+      are enough to linearize the product.
+    - The universal locations count offset * k * (k - 1) / 2 for a batch of k orders, through
+      binaries s[p, k] with sum_k s[p, k] <= 1 and sum_k k * s[p, k] <= sum_o y[p, o].
+
+    initial_batches, solver and builder are those of model_batching.
+    """
+    if builder != "pulp":
+        return model_batching(data, compact=True, initial_batches=initial_batches, solver=solver, builder=builder)
 
-    batches = {
-        p : [o for o in range(nb_orders) if (solution[p,o] or 0) > 0.5]
-        for p in range(max_pickers)
-    }
+    vol = data["vol"]
 
-    return batches
+    nb_orders = data["nb_orders"]
+
+    max_nb_orders = data["max_nb_orders"]
+    max_vol = data["max_vol"]
+
+    a = data["common_locations"]
+
+    max_pickers = min(data["max_pickers"], ut.max_pickers_merge_bound(nb_orders, max_nb_orders, max_vol, vol))
+    min_pickers = min(data["min_pickers"], max_pickers)
+
+    build_start = time.perf_counter()
+    model, y, z, s = build_batching_model(list(range(nb_orders)), max_pickers, vol, a, max_nb_orders, max_vol,
+                                          name="model_batching_compact", compact=True, min_pickers=min_pickers)
+
+    if initial_batches is not None and set_batching_start(y, z, initial_batches, s) and solver is None:
+        solver = make_solver(warm_start=True)
+
+    status = solve_model(model, solver, name="model_batching_compact", build_time=time.perf_counter() - build_start)
+    print("Solver status:", pl.LpStatus[status])
+
+    batches = {p: [] for p in range(data["max_pickers"])}
+    for (p, o), var in y.items():
+        if (var.varValue or 0) > 0.5:
+            batches[p].append(o)
+
+    return {p: sorted(orders) for p, orders in batches.items()}
+
+def model_picking(data, decompose: bool = False, workers: int | None = None, time_limit: float | None = None,
+                  initial_travel: Dict[int, List[Tuple[int, int]]] | None = None, solver=None, builder: str = "pulp"):
+    """
+    Picking model: route every picker from location 0 to its arrival location (MTZ formulation).
+
+    Args:
+        data (Dict): instance data with locations_pickers (see main.add_data)
+        decompose (bool): solve one model per picker (see model_picking_decomposed)
+        workers (int | None): number of worker processes when decompose is True
+        time_limit (float | None): time limit per picker (seconds) when decompose is True
+        initial_travel (Dict | None): routes {picker: arcs} (e.g. travel of routing.heuristic_picking)
+            passed as MIP start
+        solver (pl.LpSolver | None): solver (see make_solver), PuLP's default if None;
+            a CBC solver with warmStart is used when initial_travel is given without solver
+        builder (str): "pulp" (PuLP expressions) or "bulk" (NumPy arrays written directly as MPS
+            for CBC, see model_picking_bulk), ignored when decompose is True
+
+    Returns:
+        tuple[Dict, Dict]: (travel, u_values)
+    """
+    if builder not in ("pulp", "bulk"):
+        raise ValueError(f"Unknown model builder: {builder}")
+    if builder == "bulk" and not decompose:
+        return model_picking_bulk(data, initial_travel=initial_travel, solver=solver)
+    if decompose:
+        return model_picking_decomposed(data, workers=workers, time_limit=time_limit, initial_travel=initial_travel, solver=solver)
+
+    build_start = time.perf_counter()
 
-def model_picking(data):
     adj_matrix = data["adj_matrix"]
 
     nb_locations = data["nb_locations"]
@@ -86,8 +410,12 @@ def model_picking(data):
     # Continuous variable used to eliminate sub-tours
     u = pl.LpVariable.dicts("u", [(i,p) for p in range(max_pickers) for i in locations_pickers[p]], lowBound=0, upBound=nb_locations - 1, cat="Integer")
 
+    # distances between the locations of each picker only
+    dist = {p: dict(zip(locations_pickers[p], adj_matrix[np.ix_(locations_pickers[p], locations_pickers[p])].tolist())) for p in range(max_pickers) if locations_pickers[p]}
+    index = {p: {loc: k for k, loc in enumerate(locations_pickers[p])} for p in dist}
+
     ## Objective function
-    model += pl.lpSum(adj_matrix[i][j] * x[i,j,p] for p in range(max_pickers) for i in locations_pickers[p] for j in locations_pickers[p] if i != j)
+    model += pl.lpSum(dist[p][i][index[p][j]] * x[i,j,p] for p in range(max_pickers) for i in locations_pickers[p] for j in locations_pickers[p] if i != j)
 
     ## Constraints
 
@@ -109,7 +437,7 @@ def model_picking(data):
     for p in range(max_pickers):
         if locations_pickers[p]:
             for j in locations_pickers[p]:
-                if i != j:
+                if j != locations_pickers[p][-1]:
                     model += x[locations_pickers[p][-1],j,p] == 0
 
     # constraint eliminating sub-tours
@@ -129,7 +457,13 @@ def model_picking(data):
             arrival = locations_pickers[p][-1]
             model += u[arrival, p] == nb_locations - 1
 
-    model.solve()
+    if initial_travel is not None:
+        started = [set_routing_start(x, u, locations_pickers[p], initial_travel.get(p, []), nb_locations, p)
+                   for p in range(max_pickers) if len(locations_pickers[p]) > 1]
+        if any(started) and solver is None:
+            solver = make_solver(warm_start=True)
+
+    solve_model(model, solver, name="model_picking", build_time=time.perf_counter() - build_start)
 
     sol={}
     solution = {}
@@ -151,4 +485,380 @@ def model_picking(data):
     for p in range(max_pickers) if locations_pickers[p]
 }
 
-    return travel, u_values
\ No newline at end of file
+    return travel, u_values
+
+def _solve_picker_routing(p: int, locations: List[int], dist: List[List[float]], nb_locations: int, time_limit: float | None,
+                          arcs: List[Tuple[int, int]] | None = None, solver=None):
+    """
+    Routing model of a single picker, same formulation as model_picking restricted to picker p.
+    dist[a][b] is the distance between locations[a] and locations[b], arcs an optional initial route.
+    Runs in a worker process, hence only plain data (and a picklable PuLP solver) in and out.
+    """
+    if len(locations) < 2:
+        return p, [], [0.0 for _ in locations]
+
+    n = len(locations)
+    arrival = locations[-1]
+    index = {loc: k for k, loc in enumerate(locations)}
+
+    # minimization problem creation
+    model = pl.LpProblem(f"modele_picking_{p}", pl.LpMinimize)
+
+    ## Variables
+
+    # Decision variable indicating whether the picker travels from location i to location j
+    x = pl.LpVariable.dicts("x", [(i,j) for i in locations for j in locations if i != j], cat="Binary")
+
+    # Continuous variable used to eliminate sub-tours
+    u = pl.LpVariable.dicts("u", locations, lowBound=0, upBound=nb_locations - 1, cat="Integer")
+
+    ## Objective function
+    model += pl.lpSum(dist[index[i]][index[j]] * x[i,j] for i in locations for j in locations if i != j)
+
+    ## Constraints
+
+    # the picker must enter location j from exactly one other location i
+    for j in locations:
+        if j != 0:
+            model += pl.lpSum(x[i,j] for i in locations if i != j) == 1
+
+    # the picker must leave location i to exactly one other location j
+    for i in locations:
+        if i != arrival:
+            model += pl.lpSum(x[i,j] for j in locations if i != j) == 1
+
+    # No arcs departing from the arrival point
+    for j in locations:
+        if j != arrival:
+            model += x[arrival,j] == 0
+
+    # constraint eliminating sub-tours
+    for i in locations:
+        for j in locations:
+            if i != j and j != 0 and i != arrival:
+                model += u[i] - u[j] + x[i,j] * n <= n - 1
+
+    # departure from location 0
+    model += u[0] == 0
+    model += u[arrival] == nb_locations - 1
+
+    warm_start = arcs is not None and set_routing_start(x, u, locations, arcs, nb_locations)
+    if solver is None:
+        solver = make_solver(time_limit=time_limit, msg=False, warm_start=warm_start)
+    # runs in a worker process: not recorded in the run report of the parent
+    solve_model(model, solver, name=None)
+
+    arcs = [(i, j) for i in locations for j in locations if i != j and (x[i,j].varValue or 0) > 0.5]
+    u_values = [u[i].varValue for i in locations]
+
+    return p, arcs, u_values
+
+def model_picking_decomposed(data, workers: int | None = None, time_limit: float | None = None,
+                             initial_travel: Dict[int, List[Tuple[int, int]]] | None = None, solver=None):
+    """
+    Decomposed picking model: pickers share no variables, so each one is routed by its own
+    small model. Models are dispatched over a process pool and the results are merged into
+    the (travel, u_values) shape of model_picking.
+
+    Args:
+        data (Dict): instance data with locations_pickers (see main.add_data)
+        workers (int | None): number of worker processes (None: one per CPU, 1: no pool)
+        time_limit (float | None): time limit of each picker model in seconds
+        initial_travel (Dict | None): routes {picker: arcs} passed as MIP start of each picker model
+        solver (pl.LpSolver | None): solver of each picker model, CBC with time_limit if None
+
+    Returns:
+        tuple[Dict, Dict]: (travel, u_values)
+    """
+    adj_matrix = data["adj_matrix"]
+    nb_locations = data["nb_locations"]
+    locations_pickers = data["locations_pickers"]
+
+    # only the distances between the locations of the picker are sent to the workers
+    tasks = [
+        (p, locations, adj_matrix[np.ix_(locations, locations)].tolist(), nb_locations, time_limit,
+         initial_travel.get(p) if initial_travel is not None else None, solver)
+        for p, locations in locations_pickers.items() if locations
+    ]
+
+    with instr.stage("model_picking_decomposed", pickers=len(tasks), workers=workers):
+        if workers == 1:
+            results = [_solve_picker_routing(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_solve_picker_routing, *zip(*tasks))) if tasks else []
+
+    travel = {p: [] for p in locations_pickers}
+    u_values = {}
+    for p, arcs, u in results:
+        travel[p] = arcs
+        u_values[p] = u
+
+    return travel, u_values
+
+def _bulk_options(solver) -> Dict:
+    """time_limit / gap / threads / msg of a PuLP solver (see make_solver), for BulkModel.solve."""
+    if solver is None:
+        return {"msg": True}
+    return {"time_limit": solver.timeLimit, "gap": solver.optionsDict.get("gapRel"),
+            "threads": solver.optionsDict.get("threads"), "msg": bool(solver.msg)}
+
+def _pair_counts(a, orders: np.ndarray, all_pairs: bool):
+    """
+    Pairs (i, j), i < j, of positions in orders with the number of shared locations of the
+    two orders, and the offset of a (universal locations, shared by every pair). With all_pairs,
+    every pair with its full count; otherwise only the pairs sharing other locations, with
+    their residual count (without the offset).
+    """
+    n = len(orders)
+    if isinstance(a, ut.SharedLocations):
+        position = np.full(a.nb_orders, -1, dtype=np.int64)
+        position[orders] = np.arange(n)
+        i, j = position[a.rows], position[a.cols]
+        keep = (i >= 0) & (j >= 0)
+        i, j, counts = i[keep], j[keep], a.counts[keep].astype(np.float64)
+        offset = a.offset
+    else:
+        offset = 0
+        position = {o: k for k, o in enumerate(orders.tolist())}
+        found = [(position[o], position[o2], c) for (o, o2), c in a.items() if c and o in position and o2 in position]
+        i = np.array([f[0] for f in found], dtype=np.int64)
+        j = np.array([f[1] for f in found], dtype=np.int64)
+        counts = np.array([f[2] for f in found], dtype=np.float64)
+    i, j = np.minimum(i, j), np.maximum(i, j)
+
+    if not all_pairs:
+        return i, j, counts, offset
+
+    every_i, every_j = np.triu_indices(n, 1)
+    every_counts = np.full(len(every_i), float(offset))
+    # position of pair (i, j) in the row-major upper triangle
+    every_counts[i * n - i * (i + 1) // 2 + (j - i - 1)] += counts
+    return every_i.astype(np.int64), every_j.astype(np.int64), every_counts, offset
+
+def build_batching_bulk(orders: List[int], nb_pickers: int, vol, a, max_nb_orders: int, max_vol: int, name: str = "model_batching",
+                        compact: bool = False, min_pickers: int = 0):
+    """
+    Same model as build_batching_model, assembled in bulk as a bulk_model.BulkModel.
+
+    Returns:
+        tuple[BulkModel, np.ndarray, tuple, tuple]: the model, the index of y[p, i] (-1 if absent) for
+            the i-th order, and the arrays (p, i, j, index) of the z variables and (p, k, index) of the
+            batch size indicators s
+    """
+    orders = np.asarray(orders, dtype=np.int64)
+    n = len(orders)
+    vol = np.asarray(vol, dtype=np.float64)[orders]
+    model = bm.BulkModel(name, maximize=True)
+
+    ## Variables
+
+    # y[p, i] for the pickers allowed for the i-th order
+    nb_allowed = np.minimum(np.arange(1, n + 1), nb_pickers) if compact else np.full(n, nb_pickers)
+    y_i = np.repeat(np.arange(n), nb_allowed)
+    y_p = np.arange(len(y_i)) - np.repeat(np.cumsum(nb_allowed) - nb_allowed, nb_allowed)
+    y = model.add_variables(len(y_i))
+    y_index = np.full((nb_pickers, n), -1, dtype=np.int64)
+    y_index[y_p, y_i] = y
+
+    # z[p, i, j] for the pairs (all, or sharing non-universal locations in the compact formulation),
+    # pickers of the i-th order
+    pair_i, pair_j, counts, offset = _pair_counts(a, orders, all_pairs=not compact)
+    z_pair = np.repeat(np.arange(len(pair_i)), nb_allowed[pair_i])
+    z_p = np.arange(len(z_pair)) - np.repeat(np.cumsum(nb_allowed[pair_i]) - nb_allowed[pair_i], nb_allowed[pair_i])
+    z_i, z_j = pair_i[z_pair], pair_j[z_pair]
+
+    ## Objective function
+    z = model.add_variables(len(z_pair), obj=counts[z_pair])
+
+    # s[p, k] = 1 if picker p handles k >= 2 orders, worth offset * k * (k - 1) / 2 (compact formulation)
+    if compact and offset:
+        nb_sizes = np.maximum(np.minimum(max_nb_orders, np.bincount(y_p, minlength=nb_pickers)) - 1, 0)
+        s_p = np.repeat(np.arange(nb_pickers), nb_sizes)
+        s_k = 2 + np.arange(len(s_p)) - np.repeat(np.cumsum(nb_sizes) - nb_sizes, nb_sizes)
+        s = model.add_variables(len(s_p), obj=offset * s_k * (s_k - 1) / 2)
+    else:
+        s_p = s_k = s = np.zeros(0, dtype=np.int64)
+
+    ## Constraints
+
+    # a minimum of nb_orders must be done (kept in the original formulation)
+    if not compact:
+        model.add_constraints(np.zeros(len(y), dtype=np.int64), y, 1, "G", [n])
+
+    # An order can only be done once
+    model.add_constraints(y_i, y, 1, "E", np.ones(n))
+
+    # A picker can't do more than max_nb_ord, nor carry more than max_vol
+    model.add_constraints(y_p, y, 1, "L", np.full(nb_pickers, max_nb_orders))
+    model.add_constraints(y_p, y, vol[y_i], "L", np.full(nb_pickers, max_vol))
+
+    if compact:
+        # Symmetry breaking: the first min_pickers pickers are used, then picker p only if picker p-1 is
+        first = min(min_pickers, nb_pickers)
+        used = y_p < first
+        if first:
+            model.add_constraints(y_p[used], y[used], 1, "G", np.ones(first))
+        start = max(1, min_pickers)
+        if start < nb_pickers:
+            current = y_p >= start
+            previous = (y_p + 1 >= start) & (y_p + 1 < nb_pickers)
+            rows = np.concatenate((y_p[current] - start, y_p[previous] + 1 - start))
+            cols = np.concatenate((y[current], y[previous]))
+            vals = np.concatenate((np.ones(current.sum()), np.full(previous.sum(), -float(max_nb_orders))))
+            model.add_constraints(rows, cols, vals, "L", np.zeros(nb_pickers - start))
+
+    # z[p, i, j] is the product between y[p, i] and y[p, j]
+    k = np.arange(len(z))
+    for other in (z_i, z_j):
+        model.add_constraints(np.concatenate((k, k)), np.concatenate((z, y_index[z_p, other])),
+                              np.concatenate((np.ones(len(z)), -np.ones(len(z)))), "L", np.zeros(len(z)))
+    if not compact:
+        model.add_constraints(np.concatenate((k, k, k)), np.concatenate((z, y_index[z_p, z_i], y_index[z_p, z_j])),
+                              np.concatenate((np.ones(len(z)), -np.ones(len(z)), -np.ones(len(z)))), "G", np.full(len(z), -1.0))
+
+    # s[p, k] selects at most the size of batch p
+    if len(s):
+        used = np.unique(s_p)
+        row_of = np.searchsorted(used, s_p)
+        model.add_constraints(row_of, s, 1, "L", np.ones(len(used)))
+        in_used = np.isin(y_p, used)
+        model.add_constraints(np.concatenate((row_of, np.searchsorted(used, y_p[in_used]))), np.concatenate((s, y[in_used])),
+                              np.concatenate((s_k.astype(np.float64), -np.ones(in_used.sum()))), "L", np.zeros(len(used)))
+
+    return model, y_index, (z_p, z_i, z_j, z), (s_p, s_k, s)
+
+def model_batching_bulk(data, compact: bool = False, initial_batches: Dict[int, List[int]] | None = None, solver=None) -> Dict:
+    """
+    model_batching (or model_batching_compact) built in bulk and written directly as MPS for CBC
+    (see build_batching_bulk). Same arguments and output as model_batching; the time limit, gap,
+    threads and log of solver are used.
+    """
+    vol = data["vol"]
+    nb_orders = data["nb_orders"]
+    max_nb_orders = data["max_nb_orders"]
+    max_vol = data["max_vol"]
+
+    if compact:
+        max_pickers = min(data["max_pickers"], ut.max_pickers_merge_bound(nb_orders, max_nb_orders, max_vol, vol))
+        min_pickers = min(data["min_pickers"], max_pickers)
+        name = "model_batching_compact"
+    else:
+        max_pickers, min_pickers, name = data["max_pickers"], 0, "model_batching"
+
+    build_start = time.perf_counter()
+    model, y_index, (z_p, z_i, z_j, z), (s_p, s_k, s) = build_batching_bulk(
+        list(range(nb_orders)), max_pickers, vol, data["common_locations"], max_nb_orders, max_vol,
+        name=name, compact=compact, min_pickers=min_pickers)
+
+    initial = None
+    if initial_batches is not None:
+        ordered = sorted((sorted(orders) for orders in initial_batches.values() if orders), key=lambda orders: orders[0])
+        picker_of = np.full(nb_orders, -1, dtype=np.int64)
+        for p, orders in enumerate(ordered):
+            picker_of[orders] = p
+        if (picker_of >= 0).all() and (picker_of < max_pickers).all() and (y_index[picker_of, np.arange(nb_orders)] >= 0).all():
+            initial = np.zeros(model.nb_variables)
+            initial[y_index[picker_of, np.arange(nb_orders)]] = 1
+            initial[z] = (picker_of[z_i] == z_p) & (picker_of[z_j] == z_p)
+            sizes = np.bincount(picker_of, minlength=max_pickers)
+            initial[s] = sizes[s_p] == s_k
+        else:
+            logger.warning("Initial batches do not fit the batching model, solving without MIP start")
+
+    result = model.solve(initial=initial, name=name, build_time=time.perf_counter() - build_start, **_bulk_options(solver))
+    print("Solver status:", result["status"])
+
+    batches = {p: [] for p in range(data["max_pickers"])}
+    chosen = y_index >= 0
+    p_values, o_values = np.nonzero(chosen)
+    for p, o in zip(p_values.tolist(), o_values.tolist()):
+        if result["values"][y_index[p, o]] > 0.5:
+            batches.setdefault(p, []).append(o)
+
+    return {p: sorted(orders) for p, orders in batches.items()}
+
+def model_picking_bulk(data, initial_travel: Dict[int, List[Tuple[int, int]]] | None = None, solver=None):
+    """
+    model_picking built in bulk (one block of NumPy arrays per picker) and written directly as
+    MPS for CBC. Same arguments and output as model_picking; pickers with less than two
+    locations have no arc, as in model_picking_decomposed.
+    """
+    build_start = time.perf_counter()
+
+    adj_matrix = data["adj_matrix"]
+    nb_locations = data["nb_locations"]
+    locations_pickers = data["locations_pickers"]
+
+    model = bm.BulkModel("modele_picking")
+    blocks = {}
+    initial = []
+
+    for p, locations in locations_pickers.items():
+        n = len(locations)
+        if n < 2:
+            continue
+        locations_array = np.asarray(locations)
+        dist = np.asarray(adj_matrix[np.ix_(locations, locations)], dtype=np.float64)
+        arrival = n - 1
+        start = locations.index(0) if 0 in locations else 0
+
+        ## Variables
+
+        # x[a, b]: the picker travels from locations[a] to locations[b] (a != b)
+        arc_a, arc_b = np.nonzero(~np.eye(n, dtype=bool))
+        x = model.add_variables(len(arc_a), obj=dist[arc_a, arc_b])
+        # u[a]: position of locations[a], used to eliminate sub-tours
+        u = model.add_variables(n, lb=0, ub=nb_locations - 1)
+        blocks[p] = (locations, arc_a, arc_b, x, u)
+
+        ## Constraints
+
+        # enter every location but 0 exactly once, leave every location but the arrival exactly once
+        enter = locations_array[arc_b] != 0
+        model.add_constraints(np.unique(arc_b[enter], return_inverse=True)[1], x[enter], 1, "E", np.ones(int((locations_array != 0).sum())))
+        leave = arc_a != arrival
+        model.add_constraints(arc_a[leave], x[leave], 1, "E", np.ones(n - 1))
+
+        # No arcs departing from the arrival point
+        model.add_constraints(np.arange(n - 1), x[arc_a == arrival], 1, "E", np.zeros(n - 1))
+
+        # constraint eliminating sub-tours: u[a] - u[b] + n x[a, b] <= n - 1
+        mtz = enter & leave
+        k = np.arange(int(mtz.sum()))
+        model.add_constraints(np.concatenate((k, k, k)), np.concatenate((u[arc_a[mtz]], u[arc_b[mtz]], x[mtz])),
+                              np.concatenate((np.ones(len(k)), -np.ones(len(k)), np.full(len(k), float(n)))), "L", np.full(len(k), n - 1.0))
+
+        # departure from location 0, arrival at nb_locations - 1
+        model.add_constraints([0, 1], [u[start], u[arrival]], 1, "E", [0, nb_locations - 1])
+
+        if initial_travel is not None:
+            successor = dict(initial_travel.get(p, []))
+            path = [locations[start]]
+            while path[-1] in successor and len(path) <= n:
+                path.append(successor[path[-1]])
+            if sorted(path) == sorted(locations) and path[-1] == locations[-1]:
+                position = {loc: k for k, loc in enumerate(path)}
+                position[path[-1]] = nb_locations - 1
+                on_path = np.array([successor.get(locations[i]) == locations[j] for i, j in zip(arc_a.tolist(), arc_b.tolist())], dtype=np.float64)
+                initial.append((x, on_path))
+                initial.append((u, np.array([position[loc] for loc in locations], dtype=np.float64)))
+            else:
+                logger.warning("Initial route of picker %s is not a path over its locations, ignored", p)
+
+    values = None
+    if initial:
+        values = np.zeros(model.nb_variables)
+        for index, value in initial:
+            values[index] = value
+
+    result = model.solve(initial=values, name="model_picking", build_time=time.perf_counter() - build_start, **_bulk_options(solver))
+
+    travel = {p: [] for p in locations_pickers}
+    u_values = {p: [0.0 for _ in locations] for p, locations in locations_pickers.items() if locations}
+    for p, (locations, arc_a, arc_b, x, u) in blocks.items():
+        used = result["values"][x] > 0.5
+        travel[p] = [(locations[i], locations[j]) for i, j in zip(arc_a[used].tolist(), arc_b[used].tolist())]
+        u_values[p] = result["values"][u].tolist()
+
+    return travel, u_values
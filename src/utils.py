@@ -1,68 +1,507 @@
-from collections import defaultdict
-from typing import List, Dict, Set
+from itertools import chain
+from typing import List, Dict, Set, Tuple
 from math import ceil
 
+import numpy as np
+
+import instrumentation as instr
+
 def get_locations_and_orders_counts(adj_matrix, orders: List[Dict[str, object]]):
     nb_locations = len(adj_matrix)
     nb_orders = len(orders)
     return nb_locations, nb_orders
 
-def max_pickers_bounds(orders, nb_orders, max_nb_orders, max_vol, vol):
+def max_pickers_bounds(orders, nb_orders, max_nb_orders, max_vol, vol, counts=None):
     """
     Returns a lower and an upper bound on the number of pickers.
+    With counts, vol are volumes and counts their number of orders (see bin_packing_lower_bound).
 
     Lower bound respects:
     - the capacity constraint on the number of orders
-    - the capacity constraint on volume
+    - the capacity constraint on volume (Martello-Toth L2 bin-packing bound, see bin_packing_lower_bound)
 
     Upper bound is:
-        - worst case: one picker per order
+        - max_pickers_merge_bound: some optimal batching has no two batches that fit together,
+          which bounds its number of batches (instead of the worst case of one picker per order)
     """
 
     min_pickers_constr_max_nb_orders = ceil(nb_orders/max_nb_orders)
 
-    total_vol = sum(vol)
-
-    min_pickers_constr_max_vol = ceil(total_vol/max_vol)
+    min_pickers_constr_max_vol = bin_packing_lower_bound(vol, max_vol, counts)
 
     lower_bound = max(min_pickers_constr_max_nb_orders, min_pickers_constr_max_vol)
 
-    upper_bound = nb_orders
+    upper_bound = max(lower_bound, max_pickers_merge_bound(nb_orders, max_nb_orders, max_vol, vol, counts))
 
     return lower_bound, upper_bound
 
-def if_loc_in_order(nb_locations: int, orders: List[Dict[str, object]]):
+def bin_packing_lower_bound(vol, max_vol, counts=None) -> int:
     """
-    Build a dictionary data[location, order] = 1 if location is visited in order, 0 otherwise
+    Martello-Toth L2 lower bound on the number of bins of capacity max_vol needed to pack vol.
+
+    For a threshold k <= max_vol/2, orders larger than max_vol - k cannot share a picker with
+    any order of volume >= k, orders larger than max_vol/2 need a picker each, and the orders of
+    volume in [k, max_vol/2] fill at best the room left next to the latter:
+        L2(k) = |J1| + |J2| + max(0, ceil((sum(J3) - (|J2| max_vol - sum(J2))) / max_vol))
+    The bound is the largest L2(k), it is never below ceil(sum(vol) / max_vol).
+
+    If counts is given, vol holds volumes and counts[i] the number of orders of volume vol[i]
+    (e.g. a histogram of volumes kept up to date as orders come and go).
     """
-    if_loc_in_ord = {}
-    for loc in range(nb_locations):
-        for order_number in range(len(orders)):
-            visited = orders[order_number]["locations_set"]
-            if_loc_in_ord[loc, order_number] = 1 if loc in visited else 0
-    return if_loc_in_ord
+    if not len(vol):
+        return 0
 
-def common_elements(if_loc_in_ord, nb_orders, nb_locations):
-    resultat = defaultdict(int)
-    for order_number in range(nb_orders):
-        for order_number2 in range(order_number + 1, nb_orders):
-            for loc in range(nb_locations):
-                if if_loc_in_ord[loc, order_number] == 1 and if_loc_in_ord[loc, order_number2] == 1:
-                    resultat[order_number, order_number2] += 1
-    return resultat
+    vol = np.asarray(vol, dtype=np.int64)
+    counts = np.ones(len(vol), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+    by_vol = np.argsort(vol, kind="stable")
+    vol, counts = vol[by_vol], counts[by_vol]
+    # volume and number of the orders from each position on
+    suffix = np.concatenate((np.cumsum((vol * counts)[::-1])[::-1], [0]))
+    nb_suffix = np.concatenate((np.cumsum(counts[::-1])[::-1], [0]))
+    volume_bound = ceil(int(suffix[0]) / max_vol)
 
-def get_picker_locations_from_ifloc(batches: Dict[int, List[int]], if_loc_in_ord: Dict[tuple, int], nb_locations: int):
-    picker_locations = {}
+    # thresholds: every distinct volume <= max_vol/2 (L2 only changes there), and 0
+    thresholds = np.unique(np.concatenate(([0], vol[2 * vol <= max_vol])))
 
-    for picker, orders in batches.items():
-        locations = set()
+    big = np.searchsorted(vol, max_vol // 2, side="right")          # first order > max_vol/2
+    nb_big = nb_suffix[big]
+    j1 = np.searchsorted(vol, max_vol - thresholds, side="right")   # first order > max_vol - k
+    j3 = np.searchsorted(vol, thresholds, side="left")              # first order >= k
+
+    nb_j1 = nb_suffix[j1]
+    nb_j2 = nb_big - nb_j1
+    vol_j2 = suffix[big] - suffix[j1]
+    vol_j3 = suffix[j3] - suffix[big]
+    room = nb_j2 * max_vol - vol_j2
+    # ceil of the positive part, in integers
+    extra = np.maximum(0, -((room - vol_j3) // max_vol))
+
+    return max(volume_bound, int((nb_j1 + nb_j2 + extra).max()))
+
+def first_fit_decreasing(vol, max_nb_orders, max_vol) -> List[List[int]]:
+    """
+    First-fit-decreasing packing of the orders: by decreasing volume, each order goes to the
+    first batch with room for it (volume and number of orders), or opens a new batch.
+    Gives a feasible number of pickers close to bin_packing_lower_bound in O(nb_orders * nb_batches).
+
+    Note that it is not an upper bound on the pickers of an optimal batching (fewer, fuller
+    batches may share fewer locations), use max_pickers_bounds for that.
+    """
+    remaining = np.empty(len(vol), dtype=np.int64)
+    count = np.empty(len(vol), dtype=np.int64)
+    batches: List[List[int]] = []
+
+    for o in sorted(range(len(vol)), key=lambda o: -vol[o]):
+        nb_batches = len(batches)
+        fits = np.flatnonzero((remaining[:nb_batches] >= vol[o]) & (count[:nb_batches] < max_nb_orders))
+        if len(fits):
+            b = fits[0]
+            batches[b].append(o)
+        else:
+            b = nb_batches
+            batches.append([o])
+            remaining[b] = max_vol
+            count[b] = 0
+        remaining[b] -= vol[o]
+        count[b] += 1
+
+    return [sorted(batch) for batch in batches]
+
+class LocOrderIncidence:
+    """
+    Sparse version of the binary data a_io (if_loc_in_order).
+
+    a_io[loc, order] = 1 if location loc is visited in order, 0 otherwise.
+    Only the visited pairs are stored, twice:
+        - by order (CSR): order_ptr, order_locs -> sorted locations of each order
+        - by location (CSC): loc_ptr, loc_orders -> sorted orders visiting each location
+
+    Indexing with [loc, order] or .get((loc, order), 0) behaves like the former
+    dictionary, so existing callers keep working.
+    """
+
+    def __init__(self, nb_locations: int, order_ptr: np.ndarray, order_locs: np.ndarray):
+        self.nb_locations = nb_locations
+        self.nb_orders = len(order_ptr) - 1
+        self.order_ptr = order_ptr
+        self.order_locs = order_locs
+
+        # Transposed copy: orders visiting each location
+        rows = np.repeat(np.arange(self.nb_orders, dtype=np.int32), np.diff(order_ptr))
+        by_loc = np.lexsort((rows, order_locs))
+        self.loc_orders = rows[by_loc]
+        self.loc_ptr = np.zeros(nb_locations + 1, dtype=np.int64)
+        np.cumsum(np.bincount(order_locs, minlength=nb_locations), out=self.loc_ptr[1:])
+
+    @classmethod
+    def from_orders(cls, nb_locations: int, orders: List[Dict[str, object]]) -> "LocOrderIncidence":
+        """
+        Build the incidence straight from orders[o]["locations_list"].
+        Duplicated locations inside an order are counted once.
+        """
+        lengths = np.fromiter((len(order["locations_list"]) for order in orders), dtype=np.int64, count=len(orders))
+        locs = np.fromiter(chain.from_iterable(order["locations_list"] for order in orders), dtype=np.int32, count=int(lengths.sum()))
+        return cls._from_rows(nb_locations, lengths, locs)
+
+    @classmethod
+    def from_compact(cls, nb_locations: int, offsets: np.ndarray, locations: np.ndarray) -> "LocOrderIncidence":
+        """
+        Build the incidence from array-backed orders (see data_loader.load_orders_compact).
+        """
+        return cls._from_rows(nb_locations, np.diff(offsets), np.asarray(locations, dtype=np.int32))
+
+    @classmethod
+    def _from_rows(cls, nb_locations: int, lengths: np.ndarray, locs: np.ndarray) -> "LocOrderIncidence":
+        """
+        Build the incidence from the number of locations of each order and their flat locations.
+        """
+        nb_orders = len(lengths)
+        rows = np.repeat(np.arange(nb_orders, dtype=np.int32), lengths)
+
+        # sort by (order, location) and drop duplicates
+        by_order = np.lexsort((locs, rows))
+        rows, locs = rows[by_order], locs[by_order]
+        keep = np.ones(len(locs), dtype=bool)
+        keep[1:] = (rows[1:] != rows[:-1]) | (locs[1:] != locs[:-1])
+        rows, locs = rows[keep], locs[keep]
 
-        for loc in range(nb_locations):
-            for order_number in orders:
-                if if_loc_in_ord.get((loc, order_number), 0) == 1:
-                    locations.add(loc)
-                    break
+        order_ptr = np.zeros(nb_orders + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=nb_orders), out=order_ptr[1:])
+        return cls(nb_locations, order_ptr, locs)
+
+    def locations_of(self, order: int) -> np.ndarray:
+        """Sorted locations visited by an order."""
+        return self.order_locs[self.order_ptr[order]:self.order_ptr[order + 1]]
+
+    def orders_at(self, loc: int) -> np.ndarray:
+        """Sorted orders visiting a location (inverted index)."""
+        return self.loc_orders[self.loc_ptr[loc]:self.loc_ptr[loc + 1]]
+
+    def universal_locations(self) -> np.ndarray:
+        """Locations visited by every order (e.g. departure and arrival points)."""
+        if not self.nb_orders:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(np.diff(self.loc_ptr) == self.nb_orders)
+
+    def without_locations(self, locations) -> "LocOrderIncidence":
+        """Copy of the incidence where the given locations are ignored."""
+        keep = ~np.isin(self.order_locs, np.asarray(locations, dtype=np.int64))
+        rows = np.repeat(np.arange(self.nb_orders), np.diff(self.order_ptr))
+        kept_per_order = np.bincount(rows[keep], minlength=self.nb_orders)
+        order_ptr = np.zeros(self.nb_orders + 1, dtype=np.int64)
+        np.cumsum(kept_per_order, out=order_ptr[1:])
+        return LocOrderIncidence(self.nb_locations, order_ptr, self.order_locs[keep])
+
+    def overlapping_pairs(self, min_shared: int = 1, exclude=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Pairs of orders (o < o2) sharing at least min_shared locations.
+        Only pairs that actually overlap are generated, through the inverted index.
+
+        Args:
+            min_shared (int): minimum number of shared locations
+            exclude: locations to ignore, typically universal_locations()
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: (orders, orders2, shared counts)
+        """
+        incidence = self.without_locations(exclude) if exclude is not None and len(exclude) else self
+        rows, cols, counts = shared_locations(incidence)
+        keep = counts >= min_shared
+        return rows[keep], cols[keep], counts[keep]
+
+    def neighbours(self, order: int, min_shared: int = 1, exclude=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Orders sharing at least min_shared locations with the given order.
+
+        Args:
+            order (int): order number
+            min_shared (int): minimum number of shared locations
+            exclude: locations to ignore, typically universal_locations()
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (orders, shared counts), sorted by order number
+        """
+        locs = self.locations_of(order)
+        if exclude is not None and len(exclude):
+            locs = locs[~np.isin(locs, exclude)]
+        if not len(locs):
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty.copy()
+        others = np.concatenate([self.orders_at(loc) for loc in locs])
+        orders2, counts = np.unique(others, return_counts=True)
+        keep = (orders2 != order) & (counts >= min_shared)
+        return orders2[keep], counts[keep]
+
+    def __getitem__(self, key: Tuple[int, int]) -> int:
+        loc, order = key
+        if not (0 <= loc < self.nb_locations and 0 <= order < self.nb_orders):
+            raise KeyError(key)
+        row = self.locations_of(order)
+        idx = np.searchsorted(row, loc)
+        return int(idx < len(row) and row[idx] == loc)
+
+    def get(self, key: Tuple[int, int], default: int = 0) -> int:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: Tuple[int, int]) -> bool:
+        loc, order = key
+        return 0 <= loc < self.nb_locations and 0 <= order < self.nb_orders
+
+    def __len__(self) -> int:
+        return self.nb_locations * self.nb_orders
+
+def max_pickers_merge_bound(nb_orders, max_nb_orders, max_vol, vol, counts=None):
+    """
+    Upper bound on the number of pickers of an optimal batching solution.
+
+    Merging two batches never decreases the shared-locations objective, so some optimal
+    solution has no two batches that fit together. In such a solution at most one batch
+    has both at most max_nb_orders/2 orders and at most max_vol/2 volume; the others are
+    "full" (more than max_nb_orders//2 orders, hence at least that many times the smallest
+    volume) or "heavy" (at least one order and more than max_vol/2 volume). The bound is the
+    largest 1 + full + heavy such that the full and heavy batches fit in the orders and the
+    total volume. With counts, vol are volumes and counts their number of orders.
+    """
+    if not nb_orders:
+        return 0
+
+    if counts is None:
+        total_vol = sum(vol)
+        min_vol = min(vol)
+    else:
+        total_vol = sum(v * c for v, c in zip(vol, counts))
+        min_vol = min(v for v, c in zip(vol, counts) if c)
+
+    full_size = max_nb_orders // 2 + 1
+    heavy_vol = max_vol // 2 + 1
+
+    full = np.arange(nb_orders // full_size + 1)
+    heavy = np.minimum(nb_orders - full * full_size, (total_vol - full * full_size * min_vol) // heavy_vol)
+    heavy = np.maximum(heavy, 0)
+
+    return int(min(nb_orders, 1 + (full + heavy).max()))
+
+def if_loc_in_order(nb_locations: int, orders: List[Dict[str, object]]) -> LocOrderIncidence:
+    """
+    Build the sparse binary data a_io: ifloc[location, order] = 1 if location is visited in order, 0 otherwise
+    orders can be the list of dictionaries of load_orders or an array-backed instance.OrderSet.
+    """
+    if hasattr(orders, "offsets"):
+        return LocOrderIncidence.from_compact(nb_locations, orders.offsets, orders.locations)
+    return LocOrderIncidence.from_orders(nb_locations, orders)
 
-        picker_locations[picker] = sorted(locations)
+def _shared_locations_chunks(if_loc_in_ord: LocOrderIncidence, max_pairs_per_chunk: int):
+    """
+    Split the orders into consecutive chunks [start, end) so that expanding the
+    (order, location, order2) triples of a chunk stays under max_pairs_per_chunk.
+    """
+    popularity = np.diff(if_loc_in_ord.loc_ptr)
+    work = np.zeros(if_loc_in_ord.nb_orders, dtype=np.int64)
+    non_empty = np.diff(if_loc_in_ord.order_ptr) > 0
+    if len(if_loc_in_ord.order_locs):
+        sums = np.add.reduceat(popularity[if_loc_in_ord.order_locs], if_loc_in_ord.order_ptr[:-1][non_empty])
+        work[non_empty] = sums
+
+    start = 0
+    total = 0
+    for o in range(if_loc_in_ord.nb_orders):
+        if total and total + work[o] > max_pairs_per_chunk:
+            yield start, o
+            start, total = o, 0
+        total += work[o]
+    if start < if_loc_in_ord.nb_orders:
+        yield start, if_loc_in_ord.nb_orders
+
+@instr.timed()
+def shared_locations(if_loc_in_ord: LocOrderIncidence, top_k: int | None = None, max_pairs_per_chunk: int = 1 << 24):
+    """
+    Number of locations shared by each pair of orders, computed as the sparse
+    product a_io^T a_io without ever materializing the order x order matrix.
+
+    Orders are processed in chunks: for every (order, location) entry of the chunk,
+    the orders visiting that location are read from the CSC side of the incidence
+    and the resulting pairs are counted. max_pairs_per_chunk bounds the size of that
+    expansion, hence the memory used.
+
+    Args:
+        if_loc_in_ord (LocOrderIncidence): sparse a_io
+        top_k (int | None): if set, only keep for each order its top_k best neighbours
+            (a pair is kept if it is in the top_k of either order)
+        max_pairs_per_chunk (int): memory bound of one chunk (number of expanded pairs)
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: (orders, orders2, counts) with orders < orders2
+            and counts > 0
+    """
+    nb_orders = if_loc_in_ord.nb_orders
+    loc_ptr, loc_orders = if_loc_in_ord.loc_ptr, if_loc_in_ord.loc_orders
+    all_rows, all_cols, all_counts = [], [], []
+
+    for start, end in _shared_locations_chunks(if_loc_in_ord, max_pairs_per_chunk):
+        lo, hi = if_loc_in_ord.order_ptr[start], if_loc_in_ord.order_ptr[end]
+        locs = if_loc_in_ord.order_locs[lo:hi]
+        rows = np.repeat(np.arange(start, end, dtype=np.int64), np.diff(if_loc_in_ord.order_ptr[start:end + 1]))
+
+        # expand each (row, loc) into (row, every order visiting loc)
+        fan_out = loc_ptr[locs + 1] - loc_ptr[locs]
+        if not fan_out.sum():
+            continue
+        offsets = np.repeat(loc_ptr[locs] - np.cumsum(fan_out) + fan_out, fan_out)
+        cols = loc_orders[offsets + np.arange(fan_out.sum())].astype(np.int64)
+        rows = np.repeat(rows, fan_out)
+
+        # the top-k mode needs both directions, otherwise keep the upper triangle
+        keep = cols != rows if top_k else cols > rows
+        keys, counts = np.unique((rows[keep] - start) * nb_orders + cols[keep], return_counts=True)
+        rows, cols = keys // nb_orders + start, keys % nb_orders
+
+        if top_k:
+            # keys are sorted by row: rank neighbours of each row by decreasing count
+            by_count = np.lexsort((cols, -counts, rows))
+            rows, cols, counts = rows[by_count], cols[by_count], counts[by_count]
+            first = np.searchsorted(rows, rows)
+            rank = np.arange(len(rows)) - first
+            best = rank < top_k
+            rows, cols, counts = rows[best], cols[best], counts[best]
+            rows, cols = np.minimum(rows, cols), np.maximum(rows, cols)
+
+        all_rows.append(rows)
+        all_cols.append(cols)
+        all_counts.append(counts)
+
+    if not all_rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty.copy(), empty.copy()
+
+    rows = np.concatenate(all_rows)
+    cols = np.concatenate(all_cols)
+    counts = np.concatenate(all_counts)
+
+    if top_k:
+        # a pair can be selected from both of its orders
+        keys, first = np.unique(rows * nb_orders + cols, return_index=True)
+        rows, cols, counts = keys // nb_orders, keys % nb_orders, counts[first]
+
+    return rows, cols, counts
+
+class SharedLocations:
+    """
+    Number of locations shared by each pair of orders, a[o, o2] with o < o2.
+
+    Read-only mapping stored as sorted NumPy arrays (CSR by first order) instead of one
+    dictionary entry per pair. The offset locations (the universal locations, visited by every
+    order: departure and arrival) are shared by every pair and not stored: only the residual
+    overlaps are, so a pair of orders sharing nothing else costs no memory.
+
+    a[o, o2] is the stored residual count plus offset, offset for pairs that are not stored
+    (like the former defaultdict, 0 when offset is 0). keys(), items(), get() and len() only see
+    the stored pairs; items() and values() include the offset, counts holds the residual counts.
+    """
+
+    def __init__(self, rows: np.ndarray, cols: np.ndarray, counts: np.ndarray, nb_orders: int, offset: int = 0):
+        # shared_locations already returns the pairs sorted, only sort other inputs
+        ordered = len(rows) < 2 or bool(np.all((rows[1:] > rows[:-1]) | ((rows[1:] == rows[:-1]) & (cols[1:] > cols[:-1]))))
+        if not ordered:
+            by_pair = np.lexsort((cols, rows))
+            rows, cols, counts = rows[by_pair], cols[by_pair], counts[by_pair]
+        self.rows, self.cols, self.counts = rows, cols, counts
+        self.nb_orders = nb_orders
+        self.offset = int(offset)
+        self.row_ptr = np.zeros(nb_orders + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.rows, minlength=nb_orders), out=self.row_ptr[1:])
+
+    def _find(self, key: Tuple[int, int]) -> int:
+        o, o2 = key
+        if not 0 <= o < self.nb_orders:
+            return -1
+        lo, hi = self.row_ptr[o], self.row_ptr[o + 1]
+        idx = lo + np.searchsorted(self.cols[lo:hi], o2)
+        return int(idx) if idx < hi and self.cols[idx] == o2 else -1
+
+    def _is_pair(self, key: Tuple[int, int]) -> bool:
+        o, o2 = key
+        return 0 <= o < o2 < self.nb_orders
+
+    def __getitem__(self, key: Tuple[int, int]) -> int:
+        idx = self._find(key)
+        if idx >= 0:
+            return int(self.counts[idx]) + self.offset
+        return self.offset if self._is_pair(key) else 0
+
+    def get(self, key: Tuple[int, int], default: int = 0) -> int:
+        idx = self._find(key)
+        if idx >= 0:
+            return int(self.counts[idx]) + self.offset
+        return self.offset if self.offset and self._is_pair(key) else default
+
+    def __contains__(self, key: Tuple[int, int]) -> bool:
+        return self._find(key) >= 0
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return zip(self.rows.tolist(), self.cols.tolist())
+
+    def values(self):
+        return iter((self.counts + self.offset).tolist())
+
+    def items(self):
+        return zip(self.keys(), self.values())
+
+@instr.timed()
+def common_elements(if_loc_in_ord: LocOrderIncidence, nb_orders: int, nb_locations: int, top_k: int | None = None) -> SharedLocations:
+    """
+    Number of locations shared by each pair of orders: resultat[o, o2] with o < o2.
+    The universal locations are counted as an offset of every pair (see SharedLocations):
+    only the pairs sharing other locations are stored (within the top_k neighbours of an
+    order if top_k is set, by residual overlap), lookups return the offset for the others.
+    """
+    rows, cols, counts, offset = residual_shared_locations(if_loc_in_ord, top_k=top_k)
+    return pairs_to_common(rows, cols, counts, nb_orders, offset)
+
+def residual_shared_locations(if_loc_in_ord: LocOrderIncidence, top_k: int | None = None):
+    """
+    shared_locations without the universal locations of the incidence.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray, int]: (orders, orders2, residual counts) as
+            shared_locations, and the number of universal locations (shared by every pair)
+    """
+    universal = if_loc_in_ord.universal_locations()
+    # with a single order, every location is universal but there is no pair
+    if len(universal) and if_loc_in_ord.nb_orders > 1:
+        if_loc_in_ord = if_loc_in_ord.without_locations(universal)
+    else:
+        universal = universal[:0]
+    rows, cols, counts = shared_locations(if_loc_in_ord, top_k=top_k)
+    return rows, cols, counts, len(universal)
+
+def pairs_to_common(rows: np.ndarray, cols: np.ndarray, counts: np.ndarray, nb_orders: int, offset: int = 0) -> SharedLocations:
+    """
+    Shared locations mapping resultat[o, o2] = count (+ offset) from the arrays returned by
+    shared_locations (residual_shared_locations).
+    """
+    return SharedLocations(rows, cols, counts, nb_orders, offset)
+
+@instr.timed()
+def get_picker_locations_from_ifloc(batches: Dict[int, List[int]], if_loc_in_ord: LocOrderIncidence, nb_locations: int):
+    """
+    Sorted list of the locations each picker has to visit (union of the locations of its orders).
+    """
+    picker_locations = {}
+
+    for picker, orders in batches.items():
+        if not orders:
+            picker_locations[picker] = []
+            continue
+        locations = np.unique(np.concatenate([if_loc_in_ord.locations_of(o) for o in orders]))
+        picker_locations[picker] = locations.tolist()
 
-    return picker_locations
\ No newline at end of file
+    return picker_locations